@@ -1,12 +1,25 @@
+import array
+import asyncio
 import binascii
+import bisect
+import collections
+import hashlib
+import heapq
 import io
+import itertools
+import mmap
+import operator
 import os
 import shutil
 import stat
 import struct
 import sys
+import tempfile
 import threading
 import time
+import warnings
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 try:
 
@@ -34,12 +47,23 @@ except ImportError:
 
     lzma = None
 
+try:
+
+    import fcntl
+
+except ImportError:
+
+    fcntl = None
+
 class BadZipFile(Exception):
     pass
 
 class LargeZipFile(Exception):
     pass
 
+class DecompressionLimitError(BadZipFile):
+    pass
+
 error = BadZipfile = BadZipFile      # Pre-3.2 compatibility names
 
 ZIP64_LIMIT = (1 << 31) - 1
@@ -76,10 +100,13 @@ _ECD_LOCATION = 9
 structCentralDir = "<4s4B4HL2L5H2L"
 stringCentralDir = b"PK\001\002"
 sizeCentralDir = struct.calcsize(structCentralDir)
+_CENTDIR_STRUCT = struct.Struct(structCentralDir)
 
 # indexes of entries in the central directory structure
 _CD_SIGNATURE = 0
+_CD_EXTRACT_VERSION = 3
 _CD_FLAG_BITS = 5
+_CD_COMPRESSED_SIZE = 10
 _CD_FILENAME_LENGTH = 12
 _CD_EXTRA_FIELD_LENGTH = 13
 _CD_COMMENT_LENGTH = 14
@@ -97,7 +124,15 @@ stringFileHeader = b"PK\003\004"
 sizeFileHeader = struct.calcsize(structFileHeader)
 
 _FH_SIGNATURE = 0
+_FH_EXTRACT_VERSION = 1
+_FH_EXTRACT_SYSTEM = 2
 _FH_GENERAL_PURPOSE_FLAG_BITS = 3
+_FH_COMPRESSION_METHOD = 4
+_FH_LAST_MOD_TIME = 5
+_FH_LAST_MOD_DATE = 6
+_FH_CRC = 7
+_FH_COMPRESSED_SIZE = 8
+_FH_UNCOMPRESSED_SIZE = 9
 _FH_FILENAME_LENGTH = 10
 _FH_EXTRA_FIELD_LENGTH = 11
 
@@ -111,6 +146,10 @@ sizeEndCentDir64 = struct.calcsize(structEndArchive64)
 
 _DD_SIGNATURE = 0x08074b50
 
+structIndexCacheHeader = "<6sL"
+stringIndexCacheHeader = b"PKidx\001"
+sizeIndexCacheHeader = struct.calcsize(structIndexCacheHeader)
+
 _EXTRA_FIELD_STRUCT = struct.Struct('<HH')
 
 def _strip_extra(extra, xids):
@@ -175,7 +214,8 @@ def _EndRecData64(fpin, offset, endrec):
 
         return endrec
         
-    sig, disk_num, disk_dir, dircount, dircount2, dirsize, diroffset = struct.unpack(structEndArchive64, data)
+    (sig, sz, create_version, read_version, disk_num, disk_dir,
+     dircount, dircount2, dirsize, diroffset) = struct.unpack(structEndArchive64, data)
 
     if sig != stringEndArchive64:
 
@@ -240,6 +280,20 @@ def _EndRecData(fpin):
 
     return None
 
+def _clean_filename(filename):
+
+    null_byte = filename.find(chr(0))
+
+    if null_byte >= 0:
+
+        filename = filename[0:null_byte]
+
+    if os.sep != "/" and os.sep in filename:
+
+        filename = filename.replace(os.sep, "/")
+
+    return filename
+
 class ZipInfo (object):
 
     __slots__ = (
@@ -252,17 +306,7 @@ class ZipInfo (object):
     def __init__(self, filename="NoName", date_time=(1980,1,1,0,0,0)):
 
         self.orig_filename = filename
-        null_byte = filename.find(chr(0))
-
-        if null_byte >= 0:
-
-            filename = filename[0:null_byte]
-
-        if os.sep != "/" and os.sep in filename:
-
-            filename = filename.replace(os.sep, "/")
-
-        self.filename = filename
+        self.filename = _clean_filename(filename)
         self.date_time = date_time
 
         if date_time[0] < 1980:
@@ -490,6 +534,8 @@ class ZipInfo (object):
         return self.filename[-1] == '/'
 
 _crctable = None
+_crctable_low = None
+_crctable_high = None
 
 def _gen_crc(crc):
 
@@ -505,50 +551,108 @@ def _gen_crc(crc):
 
     return crc
 
-def _ZipDecrypter(pwd):
+_keystream_table = None
 
-    key0 = 305419896
-    key1 = 591751049
-    key2 = 878082192
+def _gen_keystream(key2):
 
-    global _crctable
+    k = key2 | 2
 
-    if _crctable is None:
+    return ((k * (k ^ 1)) >> 8) & 0xFF
 
-        _crctable = list(map(_gen_crc, range(256)))
-        
-    crctable = _crctable
+class _ZipDecrypter:
 
-    def crc32(ch, crc):
-        
-        return (crc >> 8) ^ crctable[(crc ^ ch) & 0xFF]
+    # The key schedule is inherently serial, so the speed comes from doing
+    # everything per byte with locals: the keystream byte depends only on
+    # the low 16 bits of key2 and is looked up instead of multiplied.
+    #
+    # Inside the loops key0 and key2 are split into their low byte and the
+    # 24 bits above it.  CPython does bitwise operations on ints below
+    # 2**30 much faster than on full 32-bit values, and the split makes
+    # the masks on the CRC index disappear; the keystream table is
+    # indexed by the two low bytes of key2 as a row and a column.
+    def __init__(self, pwd):
 
-    def update_keys(c):
+        global _crctable, _crctable_low, _crctable_high, _keystream_table
 
-        nonlocal key0, key1, key2
-        key0 = crc32(c, key0)
-        key1 = (key1 + (key0 & 0xFF)) & 0xFFFFFFFF
-        key1 = (key1 * 134775813 + 1) & 0xFFFFFFFF
-        key2 = crc32(key1 >> 24, key2)
+        if _crctable is None:
 
-    for p in pwd:
-        update_keys(p)
+            _crctable = list(map(_gen_crc, range(256)))
+            _crctable_low = [crc & 0xFF for crc in _crctable]
+            _crctable_high = [crc >> 8 for crc in _crctable]
 
-    def decrypter(data):
-        
-        result = bytearray()
+        if _keystream_table is None:
+
+            keystream = bytes(map(_gen_keystream, range(1 << 16)))
+            _keystream_table = [keystream[i:i + 256] for i in range(0, 1 << 16, 256)]
+
+        self.key0 = 305419896
+        self.key1 = 591751049
+        self.key2 = 878082192
+
+        crctable = _crctable
+        key0, key1, key2 = self.key0, self.key1, self.key2
+
+        for c in pwd:
+
+            key0 = (key0 >> 8) ^ crctable[(key0 ^ c) & 0xFF]
+            key1 = ((key1 + (key0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+            key2 = (key2 >> 8) ^ crctable[(key2 ^ (key1 >> 24)) & 0xFF]
+
+        self.key0, self.key1, self.key2 = key0, key1, key2
+
+    def __call__(self, data):
+
+        low, high = _crctable_low, _crctable_high
+        keystream = _keystream_table
+        low0, high0 = self.key0 & 0xFF, self.key0 >> 8
+        key1 = self.key1
+        low2, high2 = self.key2 & 0xFF, self.key2 >> 8
+        result = []
         append = result.append
 
         for c in data:
 
-            k = key2 | 2
-            c ^= ((k * (k^1)) >> 8) & 0xFF
-            update_keys(c)
+            row = high2 & 0xFF
+            c ^= keystream[row][low2]
             append(c)
+            i = low0 ^ c
+            low0 = (high0 & 0xFF) ^ low[i]
+            high0 = (high0 >> 8) ^ high[i]
+            key1 = ((key1 + low0) * 134775813 + 1) & 0xFFFFFFFF
+            i = low2 ^ (key1 >> 24)
+            low2 = row ^ low[i]
+            high2 = (high2 >> 8) ^ high[i]
+
+        self.key0 = high0 << 8 | low0
+        self.key1 = key1
+        self.key2 = high2 << 8 | low2
 
         return bytes(result)
 
-    return decrypter
+    def skip(self, data):
+
+        # Advance the key schedule over data without keeping the plaintext.
+        low, high = _crctable_low, _crctable_high
+        keystream = _keystream_table
+        low0, high0 = self.key0 & 0xFF, self.key0 >> 8
+        key1 = self.key1
+        low2, high2 = self.key2 & 0xFF, self.key2 >> 8
+
+        for c in data:
+
+            row = high2 & 0xFF
+            c ^= keystream[row][low2]
+            i = low0 ^ c
+            low0 = (high0 & 0xFF) ^ low[i]
+            high0 = (high0 >> 8) ^ high[i]
+            key1 = ((key1 + low0) * 134775813 + 1) & 0xFFFFFFFF
+            i = low2 ^ (key1 >> 24)
+            low2 = row ^ low[i]
+            high2 = (high2 >> 8) ^ high[i]
+
+        self.key0 = high0 << 8 | low0
+        self.key1 = key1
+        self.key2 = high2 << 8 | low2
 
 compressor_names = {
     0: 'store',
@@ -570,6 +674,87 @@ compressor_names = {
     98: 'ppmd',
 }
 
+class LZMACompressor:
+
+    # Raw LZMA1 behind the zip properties header: version 9.4, the
+    # properties size and the encoded filter properties.
+    def __init__(self, preset=None):
+
+        self._preset = lzma.PRESET_DEFAULT if preset is None else preset
+        self._comp = None
+
+    def _init(self):
+
+        # The header only carries the dictionary and literal settings, so
+        # the encoder is built from the full preset, not from the header.
+        filters = {'id': lzma.FILTER_LZMA1, 'preset': self._preset}
+        props = lzma._encode_filter_properties(filters)
+        self._comp = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[filters])
+
+        return struct.pack('<BBH', 9, 4, len(props)) + props
+
+    def compress(self, data):
+
+        if self._comp is None:
+
+            return self._init() + self._comp.compress(data)
+
+        return self._comp.compress(data)
+
+    def flush(self):
+
+        if self._comp is None:
+
+            return self._init() + self._comp.flush()
+
+        return self._comp.flush()
+
+class LZMADecompressor:
+
+    def __init__(self):
+
+        self._decomp = None
+        self._unconsumed = b''
+        self.eof = False
+
+    @property
+    def needs_input(self):
+
+        return self._decomp is None or self._decomp.needs_input
+
+    @property
+    def unused_data(self):
+
+        return b'' if self._decomp is None else self._decomp.unused_data
+
+    def decompress(self, data, max_length=-1):
+
+        if self._decomp is None:
+
+            self._unconsumed += data
+
+            if len(self._unconsumed) <= 4:
+
+                return b''
+
+            psize, = struct.unpack('<H', self._unconsumed[2:4])
+
+            if len(self._unconsumed) <= 4 + psize:
+
+                return b''
+
+            self._decomp = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[
+                lzma._decode_filter_properties(lzma.FILTER_LZMA1,
+                                               self._unconsumed[4:4 + psize])
+            ])
+            data = self._unconsumed[4 + psize:]
+            del self._unconsumed
+
+        result = self._decomp.decompress(data, max_length)
+        self.eof = self._decomp.eof
+
+        return result
+
 def _check_compression(compression):
 
     if compression == ZIP_STORED:
@@ -616,6 +801,10 @@ def _get_compressor(compress_type, compresslevel=None):
             
         return bz2.BZ2Compressor()
 
+    elif compress_type == ZIP_LZMA:
+
+        return LZMACompressor(compresslevel)
+
     else:
 
         return None
@@ -636,6 +825,10 @@ def _get_decompressor(compress_type):
 
         return bz2.BZ2Decompressor()
 
+    elif compress_type == ZIP_LZMA:
+
+        return LZMADecompressor()
+
     else:
 
         descr = compressor_names.get(compress_type)
@@ -648,1377 +841,4291 @@ def _get_decompressor(compress_type):
 
             raise NotImplementedError("compression type %d" % (compress_type,))
 
-class _SharedFile:
+class DecompressionLimits:
 
-    def __init__(self, file, pos, close, lock, writing):
-        self._file = file
-        self._pos = pos
-        self._close = close
-        self._lock = lock
-        self._writing = writing
-        self.seekable = file.seekable
+    def __init__(self, max_total_size=None, max_ratio=None, max_entry_ratio=None):
 
-    def tell(self):
+        self.max_total_size = max_total_size
+        self.max_ratio = max_ratio
+        self.max_entry_ratio = max_entry_ratio
+        self.archive_size = 0
+        self.total_size = 0
+        self._lock = threading.Lock()
 
-        return self._pos
+    def __repr__(self):
 
-    def seek(self, offset, whence=0):
+        return ('<%s max_total_size=%r max_ratio=%r max_entry_ratio=%r total_size=%r>'
+                % (self.__class__.__name__, self.max_total_size, self.max_ratio,
+                   self.max_entry_ratio, self.total_size))
 
-        with self._lock:
+    def _would_exceed(self, nbytes):
 
-            if self._writing():
+        total_size = self.total_size + nbytes
 
-                raise ValueError("Can't reposition in the ZIP file while "
-                        "there is an open writing handle on it. "
-                        "Close the writing handle before trying to read.")
+        return ((self.max_total_size is not None and total_size > self.max_total_size) or
+                (self.max_ratio is not None and total_size > self.max_ratio * max(self.archive_size, 1)))
 
-            self._file.seek(offset, whence)
-            self._pos = self._file.tell()
+    def _charge(self, name, nbytes, entry_size, entry_compress_size):
 
-            return self._pos
+        with self._lock:
 
-    def read(self, n=-1):
+            self.total_size += nbytes
+            total_size = self.total_size
 
-        with self._lock:
+        if self.max_total_size is not None and total_size > self.max_total_size:
 
-            if self._writing():
+            raise DecompressionLimitError("Archive expands beyond %d bytes while reading %r"
+                                          % (self.max_total_size, name))
 
-                raise ValueError("Can't read from the ZIP file while there "
-                        "is an open writing handle on it. "
-                        "Close the writing handle before trying to read.")
+        if self.max_ratio is not None and total_size > self.max_ratio * max(self.archive_size, 1):
 
-            self._file.seek(self._pos)
-            data = self._file.read(n)
-            self._pos = self._file.tell()
+            raise DecompressionLimitError("Archive expands more than %r times its size while reading %r"
+                                          % (self.max_ratio, name))
 
-            return data
+        if (self.max_entry_ratio is not None and
+            entry_size > self.max_entry_ratio * max(entry_compress_size, 1)):
 
-    def close(self):
+            raise DecompressionLimitError("File %r expands more than %r times its compressed size"
+                                          % (name, self.max_entry_ratio))
 
-        if self._file is not None:
+def _limits_bound_size(limits):
 
-            fileobj = self._file
-            self._file = None
-            self._close(fileobj)
+    return limits is not None and (limits.max_total_size is not None or
+                                   limits.max_ratio is not None or
+                                   limits.max_entry_ratio is not None)
 
-class _Tellable:
+class _CentralDirTable:
 
-    def __init__(self, fp):
+    def __init__(self, zipfile, data, concat):
 
-        self.fp = fp
-        self.offset = 0
+        self._zipfile = zipfile
+        self._data = data
+        self._concat = concat
+        self._offsets = array.array('Q')
 
-    def write(self, data):
+    def __len__(self):
 
-        n = self.fp.write(data)
-        self.offset += n
+        return len(self._offsets)
 
-        return n
+    def info(self, index):
 
-    def tell(self):
+        return self._zipfile._decode_centdir(self._data, self._offsets[index], self._concat)[0]
 
-        return self.offset
+    def name(self, index):
 
-    def flush(self):
+        pos = self._offsets[index]
+        centdir = _CENTDIR_STRUCT.unpack_from(self._data, pos)
+        pos += sizeCentralDir
+        filename = self._data[pos:pos + centdir[_CD_FILENAME_LENGTH]]
 
-        self.fp.flush()
+        if centdir[_CD_FLAG_BITS] & _MASK_UTF_FILENAME:
 
-    def close(self):
+            return _clean_filename(str(filename, 'utf-8'))
 
-        self.fp.close()
+        return _clean_filename(str(filename, self._zipfile.metadata_encoding or 'cp437'))
 
-class ZipExtFile(io.BufferedIOBase):
+    def _detach(self):
 
-    MAX_N = 1 << 31 - 1
-    MIN_READ_SIZE = 4096
-    MAX_SEEK_READ = 1 << 24
+        # Keep a private copy once the mapping behind the view goes away.
+        if isinstance(self._data, memoryview):
 
-    def __init__(self, fileobj, mode, zipinfo, pwd=None, close_fileobj=False):
+            data = self._data
+            self._data = bytes(data)
+            data.release()
 
-        self._fileobj = fileobj
-        self._pwd = pwd
-        self._close_fileobj = close_fileobj
+class ZipIndex:
 
-        self._compress_type = zipinfo.compress_type
-        self._compress_left = zipinfo.compress_size
-        self._left = zipinfo.file_size
+    _COLUMNS = (
+        ('header_offset', 'Q'), ('compress_size', 'Q'), ('file_size', 'Q'),
+        ('CRC', 'L'), ('compress_type', 'H'), ('flag_bits', 'H'),
+        ('raw_time', 'H'), ('raw_date', 'H'), ('create_version', 'B'),
+        ('create_system', 'B'), ('extract_version', 'B'), ('reserved', 'B'),
+        ('volume', 'H'), ('internal_attr', 'H'), ('external_attr', 'L'),
+        ('name_offsets', 'Q'), ('extra_offsets', 'Q'), ('comment_offsets', 'Q'),
+    )
 
-        self._decompressor = _get_decompressor(self._compress_type)
+    def __init__(self, metadata_encoding=None):
 
-        self._eof = False
-        self._readbuffer = b''
-        self._offset = 0
+        self.metadata_encoding = metadata_encoding
 
-        self.newlines = None
+        for column, typecode in self._COLUMNS:
 
-        self.mode = mode
-        self.name = zipinfo.filename
+            setattr(self, column, array.array(typecode))
 
-        if hasattr(zipinfo, 'CRC'):
+        # Variable-length fields are packed into blobs; entry i spans
+        # offsets[i]:offsets[i + 1].
+        self.name_offsets.append(0)
+        self.extra_offsets.append(0)
+        self.comment_offsets.append(0)
+        self.names = bytearray()
+        self.extras = bytearray()
+        self.comments = bytearray()
 
-            self._expected_crc = zipinfo.CRC
-            self._running_crc = crc32(b'')
+    @classmethod
+    def _from_central_dir(cls, zipfile, data, size_cd, concat):
 
-        else:
+        index = cls(zipfile.metadata_encoding)
+        unpack_from = _CENTDIR_STRUCT.unpack_from
+        names, extras, comments = index.names, index.extras, index.comments
+        total = 0
 
-            self._expected_crc = None
+        while total < size_cd:
 
-        self._seekable = False
+            if total + sizeCentralDir > len(data):
 
-        try:
+                raise BadZipFile("Truncated central directory")
 
-            if fileobj.seekable():
+            centdir = unpack_from(data, total)
 
-                self._orig_compress_start = fileobj.tell()
-                self._orig_compress_size = zipinfo.compress_size
-                self._orig_file_size = zipinfo.file_size
-                self._orig_start_crc = self._running_crc
-                self._seekable = True
+            if centdir[_CD_SIGNATURE] != stringCentralDir:
 
-        except AttributeError:
+                raise BadZipFile("Bad magic number for central directory")
 
-            pass
+            if centdir[_CD_EXTRACT_VERSION] > MAX_EXTRACT_VERSION:
 
-        self._decrypter = None
+                raise NotImplementedError("zip file version %.1f" % (centdir[_CD_EXTRACT_VERSION] / 10))
 
-        if pwd:
+            (_, create_version, create_system, extract_version, reserved,
+             flag_bits, compress_type, t, d, CRC, compress_size, file_size,
+             namelen, extralen, commentlen, volume, internal_attr,
+             external_attr, header_offset) = centdir
 
-            if zipinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
-            
-                check_byte = (zipinfo._raw_time >> 8) & 0xff
+            if 0xFFFFFFFF in (header_offset, compress_size, file_size):
+
+                x = zipfile._decode_centdir(data, total, concat)[0]
+                header_offset, compress_size, file_size = x.header_offset, x.compress_size, x.file_size
 
             else:
-                
-                check_byte = (zipinfo.CRC >> 24) & 0xff
 
-            h = self._init_decrypter()
+                header_offset += concat
+
+            index.header_offset.append(header_offset)
+            index.compress_size.append(compress_size)
+            index.file_size.append(file_size)
+            index.CRC.append(CRC)
+            index.compress_type.append(compress_type)
+            index.flag_bits.append(flag_bits)
+            index.raw_time.append(t)
+            index.raw_date.append(d)
+            index.create_version.append(create_version)
+            index.create_system.append(create_system)
+            index.extract_version.append(extract_version)
+            index.reserved.append(reserved)
+            index.volume.append(volume)
+            index.internal_attr.append(internal_attr)
+            index.external_attr.append(external_attr)
+
+            pos = total + sizeCentralDir
+            names += data[pos:pos + namelen]
+            index.name_offsets.append(len(names))
+            pos += namelen
+            extras += data[pos:pos + extralen]
+            index.extra_offsets.append(len(extras))
+            pos += extralen
+            comments += data[pos:pos + commentlen]
+            index.comment_offsets.append(len(comments))
+            total = pos + commentlen
+
+        return index
+
+    def _to_bytes(self):
+
+        chunks = []
+
+        for field in [column for column, _ in self._COLUMNS] + ['names', 'extras', 'comments']:
+
+            data = memoryview(getattr(self, field))
+            chunks.append(struct.pack('<Q', data.nbytes))
+            chunks.append(data)
+
+        return chunks
 
-            if h != check_byte:
+    @classmethod
+    def _from_bytes(cls, view, pos, metadata_encoding=None):
 
-                raise RuntimeError("Bad password for file %r" % zipinfo.orig_filename)
+        index = cls(metadata_encoding)
 
-    def _init_decrypter(self):
+        for field in [column for column, _ in cls._COLUMNS] + ['names', 'extras', 'comments']:
 
-        self._decrypter = _ZipDecrypter(self._pwd)
-        header = self._fileobj.read(12)
-        self._compress_left -= 12
+            size, = struct.unpack_from('<Q', view, pos)
+            pos += 8
+            data = getattr(index, field)
+            del data[:]
 
-        return self._decrypter(header)[11]
+            if len(view) < pos + size:
 
-    def __repr__(self):
+                raise ValueError("Truncated index")
 
-        result = ['<%s.%s' % (self.__class__.__module__, self.__class__.__qualname__)]
+            if isinstance(data, bytearray):
 
-        if not self.closed:
+                data += view[pos:pos + size]
 
-            result.append(' name=%r mode=%r' % (self.name, self.mode))
+            else:
 
-            if self._compress_type != ZIP_STORED:
+                data.frombytes(view[pos:pos + size])
 
-                result.append(' compress_type=%s' % compressor_names.get(self._compress_type, self._compress_type))
+            pos += size
 
-        else:
+        # A damaged cache can still parse; the columns have to agree with
+        # each other before any of it is trusted.
+        count = len(index.header_offset)
 
-            result.append(' [closed]')
+        for column, _ in cls._COLUMNS:
 
-        result.append('>')
+            if not column.endswith('_offsets') and len(getattr(index, column)) != count:
 
-        return ''.join(result)
+                raise ValueError("Corrupt index")
 
-    def readline(self, limit=-1):
+        for offsets, blob in ((index.name_offsets, index.names),
+                              (index.extra_offsets, index.extras),
+                              (index.comment_offsets, index.comments)):
 
-        if limit < 0:
-            
-            i = self._readbuffer.find(b'\n', self._offset) + 1
+            if len(offsets) != count + 1 or offsets[0] != 0 or offsets[-1] != len(blob):
 
-            if i > 0:
+                raise ValueError("Corrupt index")
 
-                line = self._readbuffer[self._offset: i]
-                self._offset = i
+        if pos != len(view):
 
-                return line
+            raise ValueError("Corrupt index")
 
-        return io.BufferedIOBase.readline(self, limit)
+        return index
 
-    def peek(self, n=1):
-        
-        if n > len(self._readbuffer) - self._offset:
+    def __len__(self):
 
-            chunk = self.read(n)
+        return len(self.header_offset)
 
-            if len(chunk) > self._offset:
+    def _decode_name(self, index):
 
-                self._readbuffer = chunk + self._readbuffer[self._offset:]
-                self._offset = 0
+        filename = self.names[self.name_offsets[index]:self.name_offsets[index + 1]]
 
-            else:
+        if self.flag_bits[index] & _MASK_UTF_FILENAME:
 
-                self._offset -= len(chunk)
+            return filename.decode('utf-8')
 
-        return self._readbuffer[self._offset: self._offset + 512]
+        return filename.decode(self.metadata_encoding or 'cp437')
 
-    def readable(self):
+    def name(self, index):
 
-        if self.closed:
+        return _clean_filename(self._decode_name(index))
 
-            raise ValueError("I/O operation on closed file.")
+    def info(self, index):
 
-        return True
+        x = ZipInfo(self._decode_name(index))
+        x.extra = bytes(self.extras[self.extra_offsets[index]:self.extra_offsets[index + 1]])
+        x.comment = bytes(self.comments[self.comment_offsets[index]:self.comment_offsets[index + 1]])
+        x.header_offset = self.header_offset[index]
+        x.create_version = self.create_version[index]
+        x.create_system = self.create_system[index]
+        x.extract_version = self.extract_version[index]
+        x.reserved = self.reserved[index]
+        x.flag_bits = self.flag_bits[index]
+        x.compress_type = self.compress_type[index]
+        x.CRC = self.CRC[index]
+        x.compress_size = self.compress_size[index]
+        x.file_size = self.file_size[index]
+        x.volume = self.volume[index]
+        x.internal_attr = self.internal_attr[index]
+        x.external_attr = self.external_attr[index]
 
-    def read(self, n=-1):
+        t = x._raw_time = self.raw_time[index]
+        d = self.raw_date[index]
+        x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
+                        t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
 
-        if self.closed:
+        return x
 
-            raise ValueError("read from closed file.")
+    def _data_ends(self):
 
-        if n is None or n < 0:
+        # Smallest possible end of each entry's data, see _check_overlaps.
+        namelens = map(operator.sub, itertools.islice(self.name_offsets, 1, None), self.name_offsets)
+        ends = map(operator.add, self.header_offset, self.compress_size)
 
-            buf = self._readbuffer[self._offset:]
-            self._readbuffer = b''
-            self._offset = 0
+        return array.array('Q', map(operator.add, ends, map(operator.add, namelens,
+                                                              itertools.repeat(sizeFileHeader))))
 
-            while not self._eof:
+    def total_file_size(self):
 
-                buf += self._read1(self.MAX_N)
+        return sum(self.file_size)
 
-            return buf
+    def total_compress_size(self):
 
-        end = n + self._offset
+        return sum(self.compress_size)
 
-        if end < len(self._readbuffer):
+    def max_ratio(self):
 
-            buf = self._readbuffer[self._offset:end]
-            self._offset = end
+        compress_sizes = map(max, self.compress_size, itertools.repeat(1))
 
-            return buf
+        return max(map(operator.truediv, self.file_size, compress_sizes), default=0.0)
 
-        n = end - len(self._readbuffer)
-        buf = self._readbuffer[self._offset:]
-        self._readbuffer = b''
-        self._offset = 0
+    def larger_than(self, size):
 
-        while n > 0 and not self._eof:
+        hits = map(operator.gt, self.file_size, itertools.repeat(size))
 
-            data = self._read1(n)
+        return [self.name(i) for i in itertools.compress(range(len(self)), hits)]
 
-            if n < len(data):
+    def ratio_above(self, ratio):
 
-                self._readbuffer = data
-                self._offset = n
-                buf += data[:n]
-                break
-            
-            buf += data
-            n -= len(data)
+        limits = map(operator.mul, self.compress_size, itertools.repeat(ratio))
+        hits = map(operator.gt, self.file_size, limits)
 
-        return buf
+        return [self.name(i) for i in itertools.compress(range(len(self)), hits)]
 
-    def _update_crc(self, newdata):
-        
-        if self._expected_crc is None:
-        
-            return
-            
-        self._running_crc = crc32(newdata, self._running_crc)
-        
-        if self._eof and self._running_crc != self._expected_crc:
+class _LazyFileList:
 
-            raise BadZipFile("Bad CRC-32 for file %r" % self.name)
+    def __init__(self, table):
 
-    def read1(self, n):
-        
-        if n is None or n < 0:
+        self._table = table
 
-            buf = self._readbuffer[self._offset:]
-            self._readbuffer = b''
-            self._offset = 0
+    def __len__(self):
 
-            while not self._eof:
+        return len(self._table)
 
-                data = self._read1(self.MAX_N)
+    def __getitem__(self, index):
 
-                if data:
+        if isinstance(index, slice):
 
-                    buf += data
-                    break
+            return [self._table.info(i) for i in range(len(self._table))[index]]
 
-            return buf
+        if index < 0:
 
-        end = n + self._offset
+            index += len(self._table)
 
-        if end < len(self._readbuffer):
+        if not 0 <= index < len(self._table):
 
-            buf = self._readbuffer[self._offset:end]
-            self._offset = end
+            raise IndexError("list index out of range")
 
-            return buf
+        return self._table.info(index)
 
-        n = end - len(self._readbuffer)
-        buf = self._readbuffer[self._offset:]
-        self._readbuffer = b''
-        self._offset = 0
+    def __iter__(self):
 
-        if n > 0:
+        for index in range(len(self._table)):
 
-            while not self._eof:
+            yield self._table.info(index)
 
-                data = self._read1(n)
+class _LazyNameToInfo:
 
-                if n < len(data):
+    def __init__(self, table):
 
-                    self._readbuffer = data
-                    self._offset = n
-                    buf += data[:n]
-                    break
+        self._table = table
+        self._index = None
 
-                if data:
+    def _names(self):
 
-                    buf += data
-                    break
+        if self._index is None:
 
-        return buf
+            table = self._table
+            self._index = {table.name(i): i for i in range(len(table))}
 
-    def _read1(self, n):
+        return self._index
 
-        if self._eof or n <= 0:
+    def __len__(self):
 
-            return b''
+        return len(self._names())
 
-        # Read from file.
-        if self._compress_type == ZIP_DEFLATED:
-            ## Handle unconsumed data.
-            data = self._decompressor.unconsumed_tail
-            if n > len(data):
-                data += self._read2(n - len(data))
-        else:
-            data = self._read2(n)
+    def __iter__(self):
 
-        if self._compress_type == ZIP_STORED:
-            self._eof = self._compress_left <= 0
-        elif self._compress_type == ZIP_DEFLATED:
-            n = max(n, self.MIN_READ_SIZE)
-            data = self._decompressor.decompress(data, n)
-            self._eof = (self._decompressor.eof or self._compress_left <= 0 and not self._decompressor.unconsumed_tail)
-            if self._eof:
-                data += self._decompressor.flush()
-        else:
-            data = self._decompressor.decompress(data)
-            self._eof = self._decompressor.eof or self._compress_left <= 0
+        return iter(self._names())
 
-        data = data[:self._left]
-        self._left -= len(data)
-        if self._left <= 0:
-            self._eof = True
-        self._update_crc(data)
-        return data
+    def __contains__(self, name):
 
-    def _read2(self, n):
+        return name in self._names()
 
-        if self._compress_left <= 0:
+    def __getitem__(self, name):
 
-            return b''
+        return self._table.info(self._names()[name])
 
-        n = max(n, self.MIN_READ_SIZE)
-        n = min(n, self._compress_left)
+    def get(self, name, default=None):
 
-        data = self._fileobj.read(n)
-        self._compress_left -= len(data)
+        index = self._names().get(name)
 
-        if not data:
+        if index is None:
 
-            raise EOFError
+            return default
 
-        if self._decrypter is not None:
+        return self._table.info(index)
 
-            data = self._decrypter(data)
+class _AccessIndex:
 
-        return data
+    # Decompressor snapshots taken every interval bytes of output during
+    # the first pass over a deflate member.  zlib cannot serialize its
+    # state, so an index lives as long as the ZipFile that built it.
+    def __init__(self, interval):
 
-    def close(self):
+        self.interval = interval
+        self.checkpoints = []
 
-        try:
+    def due(self, pos):
 
-            if self._close_fileobj:
+        if not self.checkpoints:
 
-                self._fileobj.close()
+            return pos >= self.interval
 
-        finally:
+        return pos >= self.checkpoints[-1][0] + self.interval
 
-            super().close()
+    def add(self, pos, state):
 
-    def seekable(self):
+        self.checkpoints.append((pos, state))
 
-        if self.closed:
+    def find(self, pos):
 
-            raise ValueError("I/O operation on closed file.")
+        i = bisect.bisect_right(self.checkpoints, pos, key=operator.itemgetter(0))
 
-        return self._seekable
+        if i:
+
+            return self.checkpoints[i - 1]
+
+        return None
+
+class _SharedFile:
+
+    def __init__(self, file, pos, close, lock, writing):
+        self._file = file
+        self._pos = pos
+        self._close = close
+        self._lock = lock
+        self._writing = writing
+        self.seekable = file.seekable
+
+    def tell(self):
+
+        return self._pos
 
     def seek(self, offset, whence=0):
 
-        if self.closed:
+        with self._lock:
 
-            raise ValueError("seek on closed file.")
+            if self._writing():
 
-        if not self._seekable:
+                raise ValueError("Can't reposition in the ZIP file while "
+                        "there is an open writing handle on it. "
+                        "Close the writing handle before trying to read.")
 
-            raise io.UnsupportedOperation("underlying stream is not seekable")
+            self._file.seek(offset, whence)
+            self._pos = self._file.tell()
 
-        curr_pos = self.tell()
+            return self._pos
 
-        if whence == 0:
+    def read(self, n=-1):
 
-            new_pos = offset
+        with self._lock:
 
-        elif whence == 1:
+            if self._writing():
 
-            new_pos = curr_pos + offset
+                raise ValueError("Can't read from the ZIP file while there "
+                        "is an open writing handle on it. "
+                        "Close the writing handle before trying to read.")
 
-        elif whence == 2:
+            self._file.seek(self._pos)
+            data = self._file.read(n)
+            self._pos = self._file.tell()
 
-            new_pos = self._orig_file_size + offset
+            return data
 
-        else:
+    def close(self):
 
-            raise ValueError("whence must be os.SEEK_SET (0), "
-                             "os.SEEK_CUR (1), or os.SEEK_END (2)")
+        if self._file is not None:
 
-        if new_pos > self._orig_file_size:
+            fileobj = self._file
+            self._file = None
+            self._close(fileobj)
 
-            new_pos = self._orig_file_size
+class _PositionalFile:
 
-        if new_pos < 0:
+    def __init__(self, file, pos, close, writing):
 
-            new_pos = 0
+        self._file = file
+        self._fd = file.fileno()
+        self._pos = pos
+        self._close = close
+        self._writing = writing
+        self.seekable = file.seekable
 
-        read_offset = new_pos - curr_pos
-        buff_offset = read_offset + self._offset
+    def tell(self):
 
-        if buff_offset >= 0 and buff_offset < len(self._readbuffer):
-            
-            self._offset = buff_offset
-            read_offset = 0
+        return self._pos
 
-        elif read_offset < 0:
-            
-            self._fileobj.seek(self._orig_compress_start)
-            self._running_crc = self._orig_start_crc
-            self._compress_left = self._orig_compress_size
-            self._left = self._orig_file_size
-            self._readbuffer = b''
-            self._offset = 0
-            self._decompressor = _get_decompressor(self._compress_type)
-            self._eof = False
-            read_offset = new_pos
-            
-            if self._decrypter is not None:
+    def seek(self, offset, whence=0):
 
-                self._init_decrypter()
+        if self._writing():
 
-        while read_offset > 0:
+            raise ValueError("Can't reposition in the ZIP file while "
+                    "there is an open writing handle on it. "
+                    "Close the writing handle before trying to read.")
 
-            read_len = min(self.MAX_SEEK_READ, read_offset)
-            self.read(read_len)
-            read_offset -= read_len
+        if whence == 1:
 
-        return self.tell()
+            offset += self._pos
 
-    def tell(self):
+        elif whence == 2:
 
-        if self.closed:
+            offset += os.fstat(self._fd).st_size
 
-            raise ValueError("tell on closed file.")
+        self._pos = offset
 
-        if not self._seekable:
+        return self._pos
 
-            raise io.UnsupportedOperation("underlying stream is not seekable")
+    def read(self, n=-1):
 
-        filepos = self._orig_file_size - self._left - len(self._readbuffer) + self._offset
+        if self._writing():
 
-        return filepos
+            raise ValueError("Can't read from the ZIP file while there "
+                    "is an open writing handle on it. "
+                    "Close the writing handle before trying to read.")
 
-class _ZipWriteFile(io.BufferedIOBase):
+        if n is None or n < 0:
 
-    def __init__(self, zf, zinfo, zip64):
+            n = max(os.fstat(self._fd).st_size - self._pos, 0)
 
-        self._zinfo = zinfo
-        self._zip64 = zip64
-        self._zipfile = zf
-        self._compressor = _get_compressor(zinfo.compress_type, zinfo._compresslevel)
-        self._file_size = 0
-        self._compress_size = 0
-        self._crc = 0
+        data = os.pread(self._fd, n, self._pos)
 
-    @property
-    def _fileobj(self):
+        if 0 < len(data) < n:
 
-        return self._zipfile.fp
+            chunks = [data]
+            size = len(data)
 
-    def writable(self):
+            while size < n:
 
-        return True
+                chunk = os.pread(self._fd, n - size, self._pos + size)
 
-    def write(self, data):
+                if not chunk:
 
-        if self.closed:
+                    break
 
-            raise ValueError('I/O operation on closed file.')
+                chunks.append(chunk)
+                size += len(chunk)
 
-        if isinstance(data, (bytes, bytearray)):
+            data = b''.join(chunks)
 
-            nbytes = len(data)
+        self._pos += len(data)
 
-        else:
+        return data
 
-            data = memoryview(data)
-            nbytes = data.nbytes
+    def readinto(self, b):
 
-        self._file_size += nbytes
+        if self._writing():
 
-        self._crc = crc32(data, self._crc)
+            raise ValueError("Can't read from the ZIP file while there "
+                    "is an open writing handle on it. "
+                    "Close the writing handle before trying to read.")
 
-        if self._compressor:
+        if hasattr(os, 'preadv'):
 
-            data = self._compressor.compress(data)
-            self._compress_size += len(data)
+            n = os.preadv(self._fd, [b], self._pos)
 
-        self._fileobj.write(data)
+        else:
 
-        return nbytes
+            data = os.pread(self._fd, len(b), self._pos)
+            n = len(data)
+            b[:n] = data
+
+        self._pos += n
+
+        return n
 
     def close(self):
 
-        if self.closed:
+        if self._file is not None:
 
-            return
+            fileobj = self._file
+            self._file = None
+            self._close(fileobj)
 
-        try:
+class _MappedFile(_PositionalFile):
 
-            super().close()
-            
-            if self._compressor:
+    def __init__(self, file, pos, close, writing, mapped):
 
-                buf = self._compressor.flush()
-                self._compress_size += len(buf)
-                self._fileobj.write(buf)
-                self._zinfo.compress_size = self._compress_size
+        super().__init__(file, pos, close, writing)
+        self._view = memoryview(mapped)
 
-            else:
+    def read(self, n=-1):
 
-                self._zinfo.compress_size = self._file_size
+        end = len(self._view)
 
-            self._zinfo.CRC = self._crc
-            self._zinfo.file_size = self._file_size
+        if n is not None and n >= 0:
 
-            if self._zinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
+            end = min(self._pos + n, end)
 
-                fmt = '<LLQQ' if self._zip64 else '<LLLL'
-                self._fileobj.write(struct.pack(fmt, _DD_SIGNATURE, self._zinfo.CRC, self._zinfo.compress_size, self._zinfo.file_size))
-                self._zipfile.start_dir = self._fileobj.tell()
+        data = self._view[self._pos:end]
+        self._pos += len(data)
 
-            else:
+        return data
 
-                if not self._zip64:
+    def readinto(self, b):
 
-                    if self._file_size > ZIP64_LIMIT:
+        n = max(min(len(b), len(self._view) - self._pos), 0)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
 
-                        raise RuntimeError('File size unexpectedly exceeded ZIP64 limit')
+        return n
 
-                    if self._compress_size > ZIP64_LIMIT:
-                        
-                        raise RuntimeError('Compressed size unexpectedly exceeded ZIP64 limit')
-                
-                self._zipfile.start_dir = self._fileobj.tell()
-                self._fileobj.seek(self._zinfo.header_offset)
-                self._fileobj.write(self._zinfo.FileHeader(self._zip64))
-                self._fileobj.seek(self._zipfile.start_dir)
+    def close(self):
 
-            self._zipfile.filelist.append(self._zinfo)
-            self._zipfile.NameToInfo[self._zinfo.filename] = self._zinfo
+        if self._file is not None:
+
+            self._view.release()
+
+        super().close()
+
+class _Tellable:
+
+    def __init__(self, fp):
+
+        self.fp = fp
+        self.offset = 0
+
+    def write(self, data):
+
+        n = self.fp.write(data)
+        self.offset += n
+
+        return n
+
+    def tell(self):
+
+        return self.offset
+
+    def flush(self):
+
+        self.fp.flush()
+
+    def close(self):
+
+        self.fp.close()
+
+class ZipExtFile(io.BufferedIOBase):
+
+    MAX_N = 1 << 31 - 1
+    MIN_READ_SIZE = 4096
+    MAX_SEEK_READ = 1 << 24
+    MAX_LIMITED_READ = 1 << 20
+    PROBE_SIZE = 1 << 12
+
+    def __init__(self, fileobj, mode, zipinfo, pwd=None, close_fileobj=False, limits=None):
+
+        self._fileobj = fileobj
+        self._pwd = pwd
+        self._close_fileobj = close_fileobj
+
+        self._compress_type = zipinfo.compress_type
+        self._compress_size = zipinfo.compress_size
+        self._compress_left = zipinfo.compress_size
+        self._left = zipinfo.file_size
+
+        self._limits = limits
+        self._produced = 0
+        self._charged = 0
+        self._access_index = None
+        self._on_verified = None
+
+        self._decompressor = _get_decompressor(self._compress_type)
+
+        self._eof = False
+        self._readbuffer = b''
+        self._offset = 0
+
+        self.newlines = None
+
+        self.mode = mode
+        self.name = zipinfo.filename
+
+        if hasattr(zipinfo, 'CRC'):
+
+            self._expected_crc = zipinfo.CRC
+            self._running_crc = crc32(b'')
+
+        else:
+
+            self._expected_crc = None
+
+        self._suspended_crc = None
+        self._seekable = False
+
+        try:
+
+            if fileobj.seekable():
+
+                self._orig_compress_start = fileobj.tell()
+                self._orig_compress_size = zipinfo.compress_size
+                self._orig_file_size = zipinfo.file_size
+                self._orig_start_crc = self._running_crc
+                self._seekable = True
+
+        except AttributeError:
+
+            pass
+
+        self._decrypter = None
+        self._pwd_ambiguous = False
+
+        if pwd:
+
+            if zipinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
+            
+                check_byte = (zipinfo._raw_time >> 8) & 0xff
+
+            else:
+                
+                check_byte = (zipinfo.CRC >> 24) & 0xff
+
+            if isinstance(pwd, bytes):
+
+                pwd = (pwd,)
+
+            # Candidates are checked against the one encryption header,
+            # which is read once however many passwords are tried.
+            header = self._fileobj.read(12)
+            self._compress_left -= 12
+            matches = []
+
+            for candidate in pwd:
+
+                decrypter = _ZipDecrypter(candidate)
+
+                if decrypter(header)[11] == check_byte:
+
+                    matches.append((candidate, decrypter))
+
+            if not matches:
+
+                raise RuntimeError("Bad password for file %r" % zipinfo.orig_filename)
+
+            if len(matches) > 1:
+
+                self._pwd_ambiguous = True
+                matches = self._probe_passwords(zipinfo, header, matches)
+
+            self._pwd, self._decrypter = matches[0]
+
+    def _probe_passwords(self, zipinfo, header, matches):
+
+        # About one wrong password in 256 still passes the check byte, so
+        # the start of the data is decoded with each candidate and the ones
+        # it doesn't decode under are dropped.  The data is then put back.
+        fileobj = self._fileobj
+
+        if self._compress_type == ZIP_STORED and self._seekable and self._expected_crc is not None:
+
+            # Stored data decodes under any password; only the CRC tells.
+            start = fileobj.tell()
+            survivors = []
+
+            for candidate, decrypter in matches:
+
+                probe = _ZipDecrypter(candidate)
+                probe(header)
+                crc = crc32(b'')
+                left = self._compress_left
+                fileobj.seek(start)
+
+                while left > 0:
+
+                    data = fileobj.read(min(left, self.MAX_LIMITED_READ))
+
+                    if not data:
+
+                        break
+
+                    left -= len(data)
+                    crc = crc32(probe(data), crc)
+
+                if crc == self._expected_crc:
+
+                    survivors.append((candidate, decrypter))
+
+            fileobj.seek(start)
+
+            return survivors or matches
+
+        if zipinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
+
+            sample = fileobj.read(self.PROBE_SIZE)
+            whole = False
+
+        else:
+
+            sample = fileobj.read(min(self._compress_left, self.PROBE_SIZE))
+            whole = len(sample) == self._compress_left and self._expected_crc is not None
+
+        if hasattr(fileobj, 'unread'):
+
+            fileobj.unread(sample)
+
+        else:
+
+            fileobj.seek(fileobj.tell() - len(sample))
+
+        survivors = []
+
+        for candidate, decrypter in matches:
+
+            probe = _ZipDecrypter(candidate)
+            probe(header)
+            data = probe(sample)
+            decompressor = _get_decompressor(self._compress_type)
+
+            try:
+
+                if decompressor is not None:
+
+                    data = decompressor.decompress(data, self.MAX_LIMITED_READ)
+
+            except Exception:
+
+                continue
+
+            # A member that fits in the sample is checked in full.
+            if whole and (decompressor is None or decompressor.eof) and crc32(data) != self._expected_crc:
+
+                continue
+
+            survivors.append((candidate, decrypter))
+
+        return survivors or matches
+
+    def _init_decrypter(self):
+
+        self._decrypter = _ZipDecrypter(self._pwd)
+        header = self._fileobj.read(12)
+        self._compress_left -= 12
+
+        return self._decrypter(header)[11]
+
+    def __repr__(self):
+
+        result = ['<%s.%s' % (self.__class__.__module__, self.__class__.__qualname__)]
+
+        if not self.closed:
+
+            result.append(' name=%r mode=%r' % (self.name, self.mode))
+
+            if self._compress_type != ZIP_STORED:
+
+                result.append(' compress_type=%s' % compressor_names.get(self._compress_type, self._compress_type))
+
+        else:
+
+            result.append(' [closed]')
+
+        result.append('>')
+
+        return ''.join(result)
+
+    def readline(self, limit=-1):
+
+        if limit < 0:
+            
+            i = self._readbuffer.find(b'\n', self._offset) + 1
+
+            if i > 0:
+
+                line = self._readbuffer[self._offset: i]
+                self._offset = i
+
+                return line
+
+        return io.BufferedIOBase.readline(self, limit)
+
+    def peek(self, n=1):
+        
+        if n > len(self._readbuffer) - self._offset:
+
+            chunk = self.read(n)
+
+            if len(chunk) > self._offset:
+
+                self._readbuffer = chunk + self._readbuffer[self._offset:]
+                self._offset = 0
+
+            else:
+
+                self._offset -= len(chunk)
+
+        return self._readbuffer[self._offset: self._offset + 512]
+
+    def readable(self):
+
+        if self.closed:
+
+            raise ValueError("I/O operation on closed file.")
+
+        return True
+
+    def read(self, n=-1):
+
+        if self.closed:
+
+            raise ValueError("read from closed file.")
+
+        # Chunks are joined once at the end; growing a bytes object in the
+        # loop would copy everything read so far on every chunk.
+        if n is None or n < 0:
+
+            chunks = [self._readbuffer[self._offset:]]
+            self._readbuffer = b''
+            self._offset = 0
+
+            while not self._eof:
+
+                chunks.append(self._read1(self.MAX_N))
+
+            return b''.join(chunks)
+
+        end = n + self._offset
+
+        if end < len(self._readbuffer):
+
+            buf = self._readbuffer[self._offset:end]
+            self._offset = end
+
+            return buf
+
+        n = end - len(self._readbuffer)
+        chunks = [self._readbuffer[self._offset:]]
+        self._readbuffer = b''
+        self._offset = 0
+
+        while n > 0 and not self._eof:
+
+            data = self._read1(n)
+
+            if n < len(data):
+
+                self._readbuffer = data
+                self._offset = n
+                chunks.append(data[:n])
+                break
+            
+            chunks.append(data)
+            n -= len(data)
+
+        return b''.join(chunks)
+
+    def readinto(self, b):
+
+        return self._readinto(b, False)
+
+    def readinto1(self, b):
+
+        return self._readinto(b, True)
+
+    def _readinto(self, b, once):
+
+        if self.closed:
+
+            raise ValueError("read from closed file.")
+
+        # Decompressed chunks are copied once, straight into the caller's
+        # buffer; stored data is read into it by the file itself.
+        direct = (self._compress_type == ZIP_STORED and self._decrypter is None and
+                  hasattr(self._fileobj, 'readinto'))
+
+        with memoryview(b) as view, view.cast('B') as target:
+
+            size = len(target)
+            pos = min(len(self._readbuffer) - self._offset, size)
+
+            if pos:
+
+                target[:pos] = memoryview(self._readbuffer)[self._offset:self._offset + pos]
+                self._offset += pos
+
+            while pos < size and not self._eof:
+
+                if direct:
+
+                    n = self._readinto_stored(target[pos:])
+
+                else:
+
+                    data = self._read1(size - pos)
+                    n = min(len(data), size - pos)
+
+                    if n < len(data):
+
+                        self._readbuffer = data
+                        self._offset = n
+                        data = memoryview(data)[:n]
+
+                    target[pos:pos + n] = data
+
+                pos += n
+
+                if once and n:
+
+                    break
+
+        return pos
+
+    def _readinto_stored(self, target):
+
+        n = min(len(target), self._compress_left, self._left)
+
+        if n <= 0:
+
+            self._eof = True
+
+            return 0
+
+        n = self._fileobj.readinto(target[:n])
+
+        if not n:
+
+            raise EOFError
+
+        self._compress_left -= n
+        self._left -= n
+        self._eof = self._compress_left <= 0 or self._left <= 0
+
+        if self._limits is not None:
+
+            self._charge_limits(n)
+
+        self._update_crc(target[:n])
+
+        return n
+
+    def _update_crc(self, newdata):
+        
+        if self._expected_crc is None:
+        
+            return
+            
+        self._running_crc = crc32(newdata, self._running_crc)
+        
+        if self._eof:
+
+            if self._running_crc != self._expected_crc:
+
+                raise BadZipFile("Bad CRC-32 for file %r" % self.name)
+
+            if self._on_verified is not None:
+
+                self._on_verified(self._pwd)
+
+    def read1(self, n):
+        
+        if n is None or n < 0:
+
+            buf = self._readbuffer[self._offset:]
+            self._readbuffer = b''
+            self._offset = 0
+
+            while not self._eof:
+
+                data = self._read1(self.MAX_N)
+
+                if data:
+
+                    buf += data
+                    break
+
+            return buf
+
+        end = n + self._offset
+
+        if end < len(self._readbuffer):
+
+            buf = self._readbuffer[self._offset:end]
+            self._offset = end
+
+            return buf
+
+        n = end - len(self._readbuffer)
+        buf = self._readbuffer[self._offset:]
+        self._readbuffer = b''
+        self._offset = 0
+
+        if n > 0:
+
+            while not self._eof:
+
+                data = self._read1(n)
+
+                if n < len(data):
+
+                    self._readbuffer = data
+                    self._offset = n
+                    buf += data[:n]
+                    break
+
+                if data:
+
+                    buf += data
+                    break
+
+        return buf
+
+    def _read1(self, n):
+
+        if self._eof or n <= 0:
+
+            return b''
+
+        # Keep chunks small enough for the limits to stop a bomb early.
+        if self._limits is not None:
+
+            n = min(n, self.MAX_LIMITED_READ)
+
+        if self._access_index is not None:
+
+            n = min(n, self._access_index.interval)
+
+        # Read from file.
+        if self._compress_type == ZIP_DEFLATED:
+            ## Handle unconsumed data.
+            data = self._decompressor.unconsumed_tail
+            if not data:
+                data = self._read2(n)
+            elif n > len(data):
+                data += self._read2(n - len(data))
+        elif self._compress_type != ZIP_STORED:
+            ## Input the decompressor holds back is fed again first.
+            data = self._read2(n) if self._decompressor.needs_input else b''
+        else:
+            data = self._read2(n)
+
+        if self._compress_type == ZIP_STORED:
+            data = bytes(data)
+            self._eof = self._compress_left <= 0
+        elif self._compress_type == ZIP_DEFLATED:
+            n = max(n, self.MIN_READ_SIZE)
+            data = self._decompressor.decompress(data, n)
+            self._eof = (self._decompressor.eof or self._compress_left <= 0 and not self._decompressor.unconsumed_tail)
+            if self._eof:
+                data += self._decompressor.flush()
+        else:
+            n = max(n, self.MIN_READ_SIZE)
+            data = self._decompressor.decompress(data, n)
+            self._eof = (self._decompressor.eof or self._compress_left <= 0 and self._decompressor.needs_input)
+
+        data = data[:self._left]
+        self._left -= len(data)
+        if self._left <= 0:
+            self._eof = True
+        if self._limits is not None:
+            self._charge_limits(len(data))
+        self._update_crc(data)
+        if self._access_index is not None and not self._eof:
+            self._save_checkpoint()
+        return data
+
+    def _save_checkpoint(self):
+
+        pos = self._orig_file_size - self._left
+
+        if self._access_index.due(pos):
+
+            keys = None
+
+            if self._decrypter is not None:
+
+                keys = (self._decrypter.key0, self._decrypter.key1, self._decrypter.key2)
+
+            self._access_index.add(pos, (self._fileobj.tell(), self._compress_left,
+                                         self._decompressor.copy(), self._running_crc, keys))
+
+    def _restore_checkpoint(self, pos, state):
+
+        file_pos, compress_left, decompressor, running_crc, keys = state
+        self._fileobj.seek(file_pos)
+        self._compress_left = compress_left
+        self._left = self._orig_file_size - pos
+        self._produced = pos
+        self._decompressor = decompressor.copy()
+        self._running_crc = running_crc
+        self._readbuffer = b''
+        self._offset = 0
+        self._eof = False
+
+        if keys is not None:
+
+            self._decrypter.key0, self._decrypter.key1, self._decrypter.key2 = keys
+
+    def _charge_limits(self, nbytes):
+
+        # Bytes inflated again after a backward seek were already charged.
+        self._produced += nbytes
+
+        if self._produced > self._charged:
+
+            nbytes = self._produced - self._charged
+            self._charged = self._produced
+            self._limits._charge(self.name, nbytes, self._produced,
+                                 self._compress_size - self._compress_left)
+
+    def _read2(self, n):
+
+        if self._compress_left <= 0:
+
+            return b''
+
+        n = max(n, self.MIN_READ_SIZE)
+        n = min(n, self._compress_left)
+
+        data = self._fileobj.read(n)
+        self._compress_left -= len(data)
+
+        if not data:
+
+            raise EOFError
+
+        if self._decrypter is not None:
+
+            data = self._decrypter(data)
+
+        return data
+
+    def close(self):
+
+        try:
+
+            if self._close_fileobj:
+
+                self._fileobj.close()
+
+        finally:
+
+            super().close()
+
+    def seekable(self):
+
+        if self.closed:
+
+            raise ValueError("I/O operation on closed file.")
+
+        return self._seekable
+
+    def seek(self, offset, whence=0):
+
+        if self.closed:
+
+            raise ValueError("seek on closed file.")
+
+        if not self._seekable:
+
+            raise io.UnsupportedOperation("underlying stream is not seekable")
+
+        curr_pos = self.tell()
+
+        if whence == 0:
+
+            new_pos = offset
+
+        elif whence == 1:
+
+            new_pos = curr_pos + offset
+
+        elif whence == 2:
+
+            new_pos = self._orig_file_size + offset
+
+        else:
+
+            raise ValueError("whence must be os.SEEK_SET (0), "
+                             "os.SEEK_CUR (1), or os.SEEK_END (2)")
+
+        if new_pos > self._orig_file_size:
+
+            new_pos = self._orig_file_size
+
+        if new_pos < 0:
+
+            new_pos = 0
+
+        read_offset = new_pos - curr_pos
+        buff_offset = read_offset + self._offset
+
+        checkpoint = None
+
+        if self._access_index is not None:
+
+            checkpoint = self._access_index.find(new_pos)
+
+        if buff_offset >= 0 and buff_offset < len(self._readbuffer):
+            
+            self._offset = buff_offset
+            read_offset = 0
+
+        elif checkpoint is not None and (read_offset < 0 or checkpoint[0] > curr_pos):
+
+            self._restore_checkpoint(*checkpoint)
+            read_offset = new_pos - checkpoint[0]
+
+        elif self._compress_type == ZIP_STORED and read_offset != 0:
+
+            self._seek_stored(new_pos)
+            read_offset = 0
+
+        elif read_offset < 0:
+            
+            self._fileobj.seek(self._orig_compress_start)
+            self._running_crc = self._orig_start_crc
+            self._compress_left = self._orig_compress_size
+            self._left = self._orig_file_size
+            self._produced = 0
+            self._readbuffer = b''
+            self._offset = 0
+            self._decompressor = _get_decompressor(self._compress_type)
+            self._eof = False
+            read_offset = new_pos
+            
+            if self._decrypter is not None:
+
+                self._init_decrypter()
+
+        while read_offset > 0:
+
+            read_len = min(self.MAX_SEEK_READ, read_offset)
+            self.read(read_len)
+            read_offset -= read_len
+
+        return self.tell()
+
+    def _seek_stored(self, pos):
+
+        # Logical and physical offsets of a stored member differ only by
+        # the encryption header.  The running CRC cannot follow a jump, so
+        # checking is suspended until the member is read from the start.
+        if pos == 0:
+
+            self._running_crc = self._orig_start_crc
+
+            if self._suspended_crc is not None:
+
+                self._expected_crc = self._suspended_crc
+                self._suspended_crc = None
+
+        elif self._expected_crc is not None:
+
+            self._suspended_crc = self._expected_crc
+            self._expected_crc = None
+
+        consumed = self._orig_file_size - self._left
+
+        if self._decrypter is None:
+
+            self._fileobj.seek(self._orig_compress_start + pos)
+
+        else:
+
+            if pos < consumed:
+
+                self._fileobj.seek(self._orig_compress_start)
+                self._init_decrypter()
+                consumed = 0
+
+            skip = pos - consumed
+
+            while skip > 0:
+
+                data = self._fileobj.read(min(self.MAX_SEEK_READ, skip))
+
+                if not data:
+
+                    raise EOFError
+
+                self._decrypter.skip(data)
+                skip -= len(data)
+
+            self._fileobj.seek(self._orig_compress_start + 12 + pos)
+
+        self._left = self._orig_file_size - pos
+        self._compress_left = self._left
+        self._produced = pos
+        self._readbuffer = b''
+        self._offset = 0
+        self._eof = self._left <= 0
+
+    def tell(self):
+
+        if self.closed:
+
+            raise ValueError("tell on closed file.")
+
+        if not self._seekable:
+
+            raise io.UnsupportedOperation("underlying stream is not seekable")
+
+        filepos = self._orig_file_size - self._left - len(self._readbuffer) + self._offset
+
+        return filepos
+
+def _deflate_block(block, zdict, level, last):
+
+    if zdict:
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+
+    else:
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+    data = compressor.compress(block)
+
+    return data + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class _ParallelDeflater:
+
+    # Input is cut into blocks that deflate independently, each primed
+    # with the tail of the one before so matches can still reach back.
+    # A sync flush ends every block but the last on a byte boundary with
+    # the final bit clear, so the pieces concatenate into one stream.
+    BLOCK_SIZE = 1 << 17
+    DICT_SIZE = 1 << 15
+
+    def __init__(self, level, workers):
+
+        self._level = zlib.Z_DEFAULT_COMPRESSION if level is None else level
+        self._workers = workers
+        self._executor = ThreadPoolExecutor(workers)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._zdict = b''
+
+    def _submit(self, block, last, out):
+
+        self._pending.append(self._executor.submit(_deflate_block, block, self._zdict, self._level, last))
+        self._zdict = block[-self.DICT_SIZE:]
+
+        while len(self._pending) > 2 * self._workers:
+
+            out.append(self._pending.popleft().result())
+
+    def compress(self, data):
+
+        self._buffer += data
+        out = []
+        pos = 0
+
+        while len(self._buffer) - pos >= self.BLOCK_SIZE:
+
+            self._submit(bytes(self._buffer[pos:pos + self.BLOCK_SIZE]), False, out)
+            pos += self.BLOCK_SIZE
+
+        del self._buffer[:pos]
+
+        while self._pending and self._pending[0].done():
+
+            out.append(self._pending.popleft().result())
+
+        return b''.join(out)
+
+    def flush(self):
+
+        out = []
+
+        try:
+
+            self._submit(bytes(self._buffer), True, out)
+            self._buffer = bytearray()
+            out.extend(future.result() for future in self._pending)
+            self._pending.clear()
+
+        finally:
+
+            self._executor.shutdown()
+
+        return b''.join(out)
+
+class _ZipWriteFile(io.BufferedIOBase):
+
+    def __init__(self, zf, zinfo, zip64, workers=None):
+
+        self._zinfo = zinfo
+        self._zip64 = zip64
+        self._zipfile = zf
+
+        if workers is not None and workers > 1 and zinfo.compress_type == ZIP_DEFLATED:
+
+            self._compressor = _ParallelDeflater(zinfo._compresslevel, workers)
+
+        else:
+
+            self._compressor = _get_compressor(zinfo.compress_type, zinfo._compresslevel)
+        self._file_size = 0
+        self._compress_size = 0
+        self._crc = 0
+
+    @property
+    def _fileobj(self):
+
+        return self._zipfile.fp
+
+    def writable(self):
+
+        return True
+
+    def write(self, data):
+
+        if self.closed:
+
+            raise ValueError('I/O operation on closed file.')
+
+        if isinstance(data, (bytes, bytearray)):
+
+            nbytes = len(data)
+
+        else:
+
+            data = memoryview(data)
+            nbytes = data.nbytes
+
+        self._file_size += nbytes
+
+        self._crc = crc32(data, self._crc)
+
+        if self._compressor:
+
+            data = self._compressor.compress(data)
+            self._compress_size += len(data)
+
+        self._fileobj.write(data)
+
+        return nbytes
+
+    def close(self):
+
+        if self.closed:
+
+            return
+
+        try:
+
+            super().close()
+            
+            if self._compressor:
+
+                buf = self._compressor.flush()
+                self._compress_size += len(buf)
+                self._fileobj.write(buf)
+                self._zinfo.compress_size = self._compress_size
+
+            else:
+
+                self._zinfo.compress_size = self._file_size
+
+            self._zinfo.CRC = self._crc
+            self._zinfo.file_size = self._file_size
+
+            # The descriptor, like the local header, was laid out for
+            # 32-bit sizes unless zip64 was chosen when the entry opened.
+            if not self._zip64:
+
+                if self._file_size > ZIP64_LIMIT:
+
+                    raise RuntimeError('File size unexpectedly exceeded ZIP64 limit')
+
+                if self._zinfo.compress_size > ZIP64_LIMIT:
+
+                    raise RuntimeError('Compressed size unexpectedly exceeded ZIP64 limit')
+
+            if self._zinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
+
+                fmt = '<LLQQ' if self._zip64 else '<LLLL'
+                self._fileobj.write(struct.pack(fmt, _DD_SIGNATURE, self._zinfo.CRC, self._zinfo.compress_size, self._zinfo.file_size))
+                self._zipfile.start_dir = self._fileobj.tell()
+
+            else:
+
+                self._zipfile.start_dir = self._fileobj.tell()
+                self._fileobj.seek(self._zinfo.header_offset)
+                self._fileobj.write(self._zinfo.FileHeader(self._zip64))
+                self._fileobj.seek(self._zipfile.start_dir)
+
+            self._zipfile.filelist.append(self._zinfo)
+            self._zipfile.NameToInfo[self._zinfo.filename] = self._zinfo
+
+        finally:
+
+            self._zipfile._writing = False
+
+class ZipFile:
+
+    fp = None
+    index = None
+    _mmap = None
+    _table = None
+    _windows_illegal_name_trans_table = None
+    _CRC_CHUNK = 1 << 24
+    _DIR_FD_CACHE = 64
+
+    def __init__(self, file, mode="r", compression=ZIP_STORED, allowZip64=True,
+                 compresslevel=None, *, strict_timestamps=True, metadata_encoding=None,
+                 strict_overlap=True, limits=None, verify_crc=True, mmap=False,
+                 lazy=False, columnar=False, index_cache=None, preallocate=False,
+                 sparse=False):
+        
+        if mode not in ('r', 'w', 'x', 'a'):
+
+            raise ValueError("ZipFile requires mode 'r', 'w', 'x', or 'a'")
+
+        _check_compression(compression)
+
+        self._allowZip64 = allowZip64
+        self._didModify = False
+        self.debug = 0
+        self.NameToInfo = {}
+        self.filelist = []
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.mode = mode
+        self.pwd = None
+        self._keyring = []
+        self._keyring_hit = None
+        self._access_indexes = {}
+        self._comment = b''
+        self._strict_timestamps = strict_timestamps
+        self._strict_overlap = strict_overlap
+        self._limits = limits
+        self._verify_crc = verify_crc
+        self._preallocate = preallocate
+        self._sparse = sparse
+
+        if preallocate and not _limits_bound_size(limits):
+
+            raise ValueError("preallocate requires limits with a cap on the extracted size")
+        self._index_cache = index_cache
+        self._columnar = columnar or bool(index_cache)
+        self._lazy = lazy and not self._columnar
+        self.metadata_encoding = metadata_encoding
+
+        if self.metadata_encoding and mode != 'r':
+            
+            raise ValueError("metadata_encoding is only supported for reading files")
+
+        if mmap and mode != 'r':
+
+            raise ValueError("mmap is only supported for reading files")
+
+        if lazy and mode != 'r':
+
+            raise ValueError("lazy is only supported for reading files")
+
+        if columnar and mode != 'r':
+
+            raise ValueError("columnar is only supported for reading files")
+
+        if index_cache and mode != 'r':
+
+            raise ValueError("index_cache is only supported for reading files")
+
+        if isinstance(file, os.PathLike):
+
+            file = os.fspath(file)
+
+        if isinstance(file, str):
+            
+            self._filePassed = 0
+            self.filename = file
+            modeDict = {'r' : 'rb', 'w': 'w+b', 'x': 'x+b', 'a' : 'r+b',
+                        'r+b': 'w+b', 'w+b': 'wb', 'x+b': 'xb'}
+
+            filemode = modeDict[mode]
+
+            while True:
+
+                try:
+
+                    self.fp = io.open(file, filemode)
+
+                except OSError:
+
+                    if filemode in modeDict:
+                        
+                        filemode = modeDict[filemode]
+                        continue
+
+                    raise
+
+                break
+
+        else:
+
+            self._filePassed = 1
+            self.fp = file
+            self.filename = getattr(file, 'name', None)
+
+        self._fileRefCnt = 1
+        self._lock = threading.RLock()
+        self._seekable = True
+        self._writing = False
+        self._pread = False
+
+        try:
+
+            if mode == 'r':
+
+                if mmap:
+
+                    self._map_file()
+
+                if not self._load_index_cache():
+
+                    self._RealGetContents()
+                    self._save_index_cache()
+
+                if hasattr(os, 'pread') and self._raw_fileno() is not None:
+
+                    self._pread = True
+
+            elif mode in ('w', 'x'):
+                
+                self._didModify = True
+
+                try:
+
+                    self.start_dir = self.fp.tell()
+
+                except (AttributeError, OSError):
+
+                    self.fp = _Tellable(self.fp)
+                    self.start_dir = 0
+                    self._seekable = False
+
+                else:
+                    
+                    try:
+
+                        self.fp.seek(self.start_dir)
+
+                    except (AttributeError, OSError):
+
+                        self._seekable = False
+
+            elif mode == 'a':
+
+                try:
+                    
+                    self._RealGetContents()                    
+                    self.fp.seek(self.start_dir)
+                    
+                except BadZipFile:
+                    
+                    self.fp.seek(0, 2)
+                    self._didModify = True
+                    self.start_dir = self.fp.tell()
+
+            else:
+
+                raise ValueError("Mode must be 'r', 'w', 'x', or 'a'")
+
+        except:
+
+            fp = self.fp
+            self.fp = None
+            self._fpclose(fp)
+
+            raise
+
+    def _raw_fileno(self):
+
+        # The descriptor is only read directly when its bytes are the
+        # archive's own.  GzipFile and friends hand out the descriptor of
+        # the compressed file underneath, so a passed-in file object has
+        # to be a plain binary file.
+        if self._filePassed and type(self.fp) not in (io.FileIO, io.BufferedReader, io.BufferedRandom):
+
+            return None
+
+        try:
+
+            return self.fp.fileno()
+
+        except (AttributeError, OSError):
+
+            return None
+
+    def _map_file(self):
+
+        fileno = self._raw_fileno()
+
+        if fileno is None:
+
+            raise ValueError("mmap requires an archive backed by a real file")
+
+        self._mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, type, value, traceback):
+
+        self.close()
+
+    def __repr__(self):
+
+        result = ['<%s.%s' % (self.__class__.__module__, self.__class__.__qualname__)]
+
+        if self.fp is not None:
+
+            if self._filePassed:
+
+                result.append(' file=%r' % self.fp)
+
+            elif self.filename is not None:
+
+                result.append(' filename=%r' % self.filename)
+
+            result.append(' mode=%r' % self.mode)
+
+        else:
+
+            result.append(' [closed]')
+            
+        result.append('>')
+
+        return ''.join(result)
+
+    def _RealGetContents(self):
+        
+        fp = self.fp
+
+        try:
+
+            endrec = _EndRecData(fp)
+
+        except OSError:
+
+            raise BadZipFile("File is not a zip file")
+
+        if not endrec:
+
+            raise BadZipFile("File is not a zip file")
+
+        if self.debug > 1:
+
+            print(endrec)
+
+        size_cd = endrec[_ECD_SIZE]
+        offset_cd = endrec[_ECD_OFFSET]
+        self._comment = endrec[_ECD_COMMENT]
+
+        self._archive_size = endrec[_ECD_LOCATION] + sizeEndCentDir + len(self._comment)
+
+        if self._limits is not None:
+
+            self._limits.archive_size = self._archive_size
+
+        concat = endrec[_ECD_LOCATION] - size_cd - offset_cd
+
+        if endrec[_ECD_SIGNATURE] == stringEndArchive64:
+        
+            concat -= (sizeEndCentDir64 + sizeEndCentDir64Locator)
+
+        if self.debug > 2:
+
+            inferred = concat + offset_cd
+            print("given, inferred, offset", offset_cd, inferred, concat)
+        
+        self.start_dir = offset_cd + concat
+
+        if self.start_dir < 0:
+
+            raise BadZipFile("Bad offset for central directory")
+
+        if self._mmap is not None:
+
+            data = memoryview(self._mmap)[self.start_dir:self.start_dir + size_cd]
+
+        else:
+
+            fp.seek(self.start_dir, 0)
+            data = fp.read(size_cd)
+
+        if self._lazy:
+
+            try:
+
+                self._scan_central_dir(data, size_cd, concat)
+
+            except:
+
+                if self._mmap is not None:
+
+                    data.release()
+
+                raise
+
+            return
+
+        try:
+
+            if self._columnar:
+
+                self._index_central_dir(data, size_cd, concat)
+
+            else:
+
+                self._read_central_dir(data, size_cd, concat)
+
+        finally:
+
+            if self._mmap is not None:
+
+                data.release()
+
+    def _decode_centdir(self, data, pos, concat):
+
+        # data is bytes or a memoryview over the mapped archive; the entry is
+        # sliced out of it in place.
+        centdir = data[pos:pos + sizeCentralDir]
+
+        if len(centdir) != sizeCentralDir:
+
+            raise BadZipFile("Truncated central directory")
+
+        centdir = struct.unpack(structCentralDir, centdir)
+
+        if centdir[_CD_SIGNATURE] != stringCentralDir:
+
+            raise BadZipFile("Bad magic number for central directory")
+
+        if self.debug > 2:
+
+            print(centdir)
+
+        pos += sizeCentralDir
+        filename = data[pos:pos + centdir[_CD_FILENAME_LENGTH]]
+        pos += centdir[_CD_FILENAME_LENGTH]
+        flags = centdir[_CD_FLAG_BITS]
+
+        if flags & _MASK_UTF_FILENAME:
+            
+            filename = str(filename, 'utf-8')
+
+        else:
+            
+            filename = str(filename, self.metadata_encoding or 'cp437')
+        
+        x = ZipInfo(filename)
+        x.extra = bytes(data[pos:pos + centdir[_CD_EXTRA_FIELD_LENGTH]])
+        pos += centdir[_CD_EXTRA_FIELD_LENGTH]
+        x.comment = bytes(data[pos:pos + centdir[_CD_COMMENT_LENGTH]])
+        x.header_offset = centdir[_CD_LOCAL_HEADER_OFFSET]
+        (x.create_version, x.create_system, x.extract_version, x.reserved,
+         x.flag_bits, x.compress_type, t, d,
+         x.CRC, x.compress_size, x.file_size) = centdir[1:12]
+
+        if x.extract_version > MAX_EXTRACT_VERSION:
+
+            raise NotImplementedError("zip file version %.1f" % (x.extract_version / 10))
+
+        x.volume, x.internal_attr, x.external_attr = centdir[15:18]
+        
+        x._raw_time = t
+        x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
+                        t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
+
+        x._decodeExtra()
+        x.header_offset = x.header_offset + concat
+
+        return x, centdir
+
+    def _read_central_dir(self, data, size_cd, concat):
+
+        total = 0
+        starts = array.array('Q')
+        ends = array.array('Q')
+
+        while total < size_cd:
+
+            x, centdir = self._decode_centdir(data, total, concat)
+            self.filelist.append(x)
+            self.NameToInfo[x.filename] = x
+            starts.append(x.header_offset)
+            ends.append(x.header_offset + sizeFileHeader
+                        + centdir[_CD_FILENAME_LENGTH] + x.compress_size)
+
+            total = (total + sizeCentralDir + centdir[_CD_FILENAME_LENGTH]
+                     + centdir[_CD_EXTRA_FIELD_LENGTH]
+                     + centdir[_CD_COMMENT_LENGTH])
+
+            if self.debug > 2:
+
+                print("total", total)
+
+        self._check_overlaps(starts, ends)
+
+    def _scan_central_dir(self, data, size_cd, concat):
+
+        # Only record where each entry starts; ZipInfo objects are decoded
+        # from the kept central directory when they are asked for.
+        table = _CentralDirTable(self, data, concat)
+        offsets = table._offsets
+        starts = array.array('Q')
+        ends = array.array('Q')
+        unpack_from = _CENTDIR_STRUCT.unpack_from
+        total = 0
+
+        while total < size_cd:
+
+            if total + sizeCentralDir > len(data):
+
+                raise BadZipFile("Truncated central directory")
+
+            centdir = unpack_from(data, total)
+
+            if centdir[_CD_SIGNATURE] != stringCentralDir:
+
+                raise BadZipFile("Bad magic number for central directory")
+
+            if centdir[_CD_EXTRACT_VERSION] > MAX_EXTRACT_VERSION:
+
+                raise NotImplementedError("zip file version %.1f" % (centdir[_CD_EXTRACT_VERSION] / 10))
+
+            offsets.append(total)
+            header_offset = centdir[_CD_LOCAL_HEADER_OFFSET]
+            compress_size = centdir[_CD_COMPRESSED_SIZE]
+
+            if header_offset == 0xFFFFFFFF or compress_size == 0xFFFFFFFF:
+
+                x = table.info(len(offsets) - 1)
+                header_offset, compress_size = x.header_offset, x.compress_size
+
+            else:
+
+                header_offset += concat
+
+            starts.append(header_offset)
+            ends.append(header_offset + sizeFileHeader
+                        + centdir[_CD_FILENAME_LENGTH] + compress_size)
+
+            total = (total + sizeCentralDir + centdir[_CD_FILENAME_LENGTH]
+                     + centdir[_CD_EXTRA_FIELD_LENGTH]
+                     + centdir[_CD_COMMENT_LENGTH])
+
+        self.filelist = _LazyFileList(table)
+        self.NameToInfo = _LazyNameToInfo(table)
+        self._check_overlaps(starts, ends)
+        self._table = table
+
+    def _index_central_dir(self, data, size_cd, concat):
+
+        index = ZipIndex._from_central_dir(self, data, size_cd, concat)
+        self.filelist = _LazyFileList(index)
+        self.NameToInfo = _LazyNameToInfo(index)
+        self._check_overlaps(index.header_offset, index._data_ends())
+        self._table = self.index = index
+
+    def _index_cache_path(self):
+
+        if self._index_cache is True:
+
+            return self.filename + '.idx'
+
+        digest = hashlib.sha1(os.fsencode(os.path.abspath(self.filename))).hexdigest()
+
+        return os.path.join(os.fspath(self._index_cache), digest + '.idx')
+
+    def _index_cache_key(self):
+
+        # A rewritten or replaced archive changes at least one of these.
+        st = os.fstat(self.fp.fileno())
+        layout = [typecode + str(array.array(typecode).itemsize) for _, typecode in ZipIndex._COLUMNS]
+
+        return repr((os.path.abspath(self.filename), st.st_size, st.st_mtime_ns,
+                     st.st_ino, st.st_dev, sys.byteorder, layout)).encode()
+
+    def _load_index_cache(self):
+
+        if not self._index_cache:
+
+            return False
+
+        if self._filePassed:
+
+            raise ValueError("index_cache requires a ZipFile opened from a path")
+
+        try:
+
+            with open(self._index_cache_path(), 'rb') as f:
+
+                data = f.read()
+
+        except OSError:
+
+            return False
+
+        key = self._index_cache_key()
+
+        try:
+
+            with memoryview(data) as view:
+
+                magic, keylen = struct.unpack_from(structIndexCacheHeader, view)
+                pos = sizeIndexCacheHeader
+
+                if magic != stringIndexCacheHeader or view[pos:pos + keylen] != key:
+
+                    return False
+
+                pos += keylen
+                self.start_dir, self._archive_size, commentlen = struct.unpack_from('<QQH', view, pos)
+                pos += 18
+                comment = bytes(view[pos:pos + commentlen])
+                index = ZipIndex._from_bytes(view, pos + commentlen, self.metadata_encoding)
+
+        except (struct.error, ValueError):
+
+            return False
+
+        self._comment = comment
+
+        if self._limits is not None:
+
+            self._limits.archive_size = self._archive_size
+
+        self.filelist = _LazyFileList(index)
+        self.NameToInfo = _LazyNameToInfo(index)
+        self._check_overlaps(index.header_offset, index._data_ends())
+        self._table = self.index = index
+
+        return True
+
+    def _save_index_cache(self):
+
+        if not self._index_cache:
+
+            return
+
+        key = self._index_cache_key()
+        path = self._index_cache_path()
+        tmppath = '%s.%d.tmp' % (path, os.getpid())
+        chunks = [struct.pack(structIndexCacheHeader, stringIndexCacheHeader, len(key)), key,
+                  struct.pack('<QQH', self.start_dir, self._archive_size, len(self._comment)),
+                  self._comment]
+        chunks.extend(self.index._to_bytes())
+
+        try:
+
+            with open(tmppath, 'wb') as f:
+
+                f.writelines(chunks)
+
+            os.replace(tmppath, path)
+
+        except OSError:
+
+            # The cache is only an accelerator; a read-only location just
+            # means the next open parses the archive again.
+            try:
+
+                os.unlink(tmppath)
+
+            except OSError:
+
+                pass
+
+    def _check_overlaps(self, starts, ends):
+
+        # Each span runs from the local header to the smallest possible end
+        # of its data.  Any intersection, including entries sharing one
+        # local header, means the archive reuses compressed bytes; that is
+        # what a full-overlap bomb looks like, so it is only let through
+        # with strict_overlap=False, e.g. for extractall(dedupe=...).
+        # Writers emit entries in file order, so sorting is usually skipped.
+        order = range(len(starts))
+
+        if any(map(operator.gt, starts, starts[1:])):
+
+            order = sorted(order, key=starts.__getitem__)
+
+        group_start = group_end = -1
+        group_index = None
+        overlaps = []
+
+        for index in order:
+
+            start = starts[index]
+            end = ends[index]
+
+            if start == group_start:
+
+                overlaps.append((group_index, index))
+
+                if end > group_end:
+
+                    group_end, group_index = end, index
+
+                continue
+
+            if start < group_end:
+
+                overlaps.append((group_index, index))
+
+            group_start, group_end, group_index = start, end, index
+
+        if group_end > self.start_dir:
+
+            overlaps.append((group_index, None))
+
+        if not overlaps:
+
+            return
+
+        first, second = overlaps[0]
+        first = self.filelist[first].filename
+
+        if second is None:
+
+            msg = "%r and the central directory" % first
+
+        else:
+
+            msg = "%r and %r" % (first, self.filelist[second].filename)
+
+        if self._strict_overlap:
+
+            raise BadZipFile("Overlapped entries: %s (possible zip bomb)" % msg)
+
+        warnings.warn("%d overlapped entries, first: %s" % (len(overlaps), msg), stacklevel=5)
+
+    def namelist(self):
+
+        if self._table is not None:
+
+            return [self._table.name(i) for i in range(len(self._table))]
+        
+        return [data.filename for data in self.filelist]
+
+    def infolist(self):
+
+        return self.filelist
+
+    def getinfo(self, name):
+        
+        info = self.NameToInfo.get(name)
+
+        if info is None:
+
+            raise KeyError('There is no item named %r in the archive' % name)
+
+        return info
+
+    @property
+    def comment(self):
+        
+        return self._comment
+
+    @comment.setter
+    def comment(self, comment):
+        
+        if not isinstance(comment, bytes):
+            
+            raise TypeError("comment: expected bytes, got %s" % type(comment).__name__)
+        
+        if len(comment) > ZIP_MAX_COMMENT:
+
+            warnings.warn('Archive comment is too long; truncating to %d bytes' % ZIP_MAX_COMMENT, stacklevel=2)
+            comment = comment[:ZIP_MAX_COMMENT]
+
+        self._comment = comment
+        self._didModify = True
+
+    def setkeyring(self, passwords):
+
+        passwords = list(passwords)
+
+        for pwd in passwords:
+
+            if not isinstance(pwd, bytes):
+
+                raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
+
+        self._keyring = passwords
+        self._keyring_hit = None
+
+    def _keyring_verified(self, pwd):
+
+        # The password that unlocked the last member is tried first next
+        # time.
+        self._keyring_hit = pwd
+
+    def read(self, name, pwd=None):
+        
+        with self.open(name, "r", pwd) as fp:
+
+            return fp.read()
+
+    def open(self, name, mode="r", pwd=None, *, force_zip64=False, checkpoint_interval=None, workers=None):
+        
+        if mode not in {"r", "w"}:
+
+            raise ValueError('open() requires mode "r" or "w"')
+
+        if pwd and (mode == "w"):
+
+            raise ValueError("pwd is only supported for reading files")
+
+        if not self.fp:
+
+            raise ValueError("Attempt to use ZIP archive that was already closed")
+
+        if isinstance(name, ZipInfo):
+
+            zinfo = name
+
+        elif mode == 'w':
+
+            zinfo = ZipInfo(name)
+            zinfo.compress_type = self.compression
+            zinfo._compresslevel = self.compresslevel
+
+        else:
+            
+            zinfo = self.getinfo(name)
+
+        if mode == 'w':
+
+            return self._open_to_write(zinfo, force_zip64=force_zip64, workers=workers)
+
+        if self._writing:
+
+            raise ValueError("Can't read from the ZIP file while there "
+                    "is an open writing handle on it. "
+                    "Close the writing handle before trying to read.")
+
+        self._fileRefCnt += 1
+
+        if self._mmap is not None:
+
+            zef_file = _MappedFile(self.fp, zinfo.header_offset, self._fpclose, lambda: self._writing, self._mmap)
+
+        elif self._pread:
+
+            zef_file = _PositionalFile(self.fp, zinfo.header_offset, self._fpclose, lambda: self._writing)
+
+        else:
+
+            zef_file = _SharedFile(self.fp, zinfo.header_offset, self._fpclose, self._lock, lambda: self._writing)
+        
+        try:
+            
+            fheader = zef_file.read(sizeFileHeader)
+
+            if len(fheader) != sizeFileHeader:
+
+                raise BadZipFile("Truncated file header")
+
+            fheader = struct.unpack(structFileHeader, fheader)
+
+            if fheader[_FH_SIGNATURE] != stringFileHeader:
+
+                raise BadZipFile("Bad magic number for file header")
+
+            fname = bytes(zef_file.read(fheader[_FH_FILENAME_LENGTH]))
+
+            if fheader[_FH_EXTRA_FIELD_LENGTH]:
+
+                zef_file.read(fheader[_FH_EXTRA_FIELD_LENGTH])
+
+            if zinfo.flag_bits & _MASK_COMPRESSED_PATCH:
+                
+                raise NotImplementedError("compressed patched data (flag bit 5)")
+
+            if zinfo.flag_bits & _MASK_STRONG_ENCRYPTION:
+                
+                raise NotImplementedError("strong encryption (flag bit 6)")
+
+            if fheader[_FH_GENERAL_PURPOSE_FLAG_BITS] & _MASK_UTF_FILENAME:
+                
+                fname_str = fname.decode("utf-8")
+                
+            else:
+
+                fname_str = fname.decode(self.metadata_encoding or "cp437")
+
+            if fname_str != zinfo.orig_filename:
+                
+                raise BadZipFile(
+                    'File name in directory %r and header %r differ.'
+                    % (zinfo.orig_filename, fname))
+
+            is_encrypted = zinfo.flag_bits & _MASK_ENCRYPTED
+
+            if is_encrypted:
+
+                if not pwd:
+
+                    pwd = self.pwd
+
+                if pwd and not isinstance(pwd, bytes):
+
+                    raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
+
+                if not pwd and self._keyring:
+
+                    # Try the password that last verified a member first.
+                    hit = self._keyring_hit
+                    pwd = [p for p in self._keyring if p != hit]
+
+                    if hit is not None:
+
+                        pwd.insert(0, hit)
+
+                if not pwd:
+
+                    raise RuntimeError("File %r is encrypted, password "
+                                       "required for extraction" % name)
+
+            else:
+
+                pwd = None
+
+            zef = ZipExtFile(zef_file, mode, zinfo, pwd, True, self._limits)
+
+            if isinstance(pwd, list):
+
+                # A password that alone passed the check byte is taken at
+                # once; when several did, only the CRC can tell them apart.
+                if zef._pwd_ambiguous:
+
+                    zef._on_verified = self._keyring_verified
+
+                else:
+
+                    self._keyring_verified(zef._pwd)
+
+            if not self._verify_crc:
+
+                zef._expected_crc = None
+
+            if checkpoint_interval and zinfo.compress_type == ZIP_DEFLATED and zef._seekable:
+
+                index = self._access_indexes.get(zinfo.header_offset)
+
+                if index is None or index.interval != checkpoint_interval:
+
+                    index = self._access_indexes[zinfo.header_offset] = _AccessIndex(checkpoint_interval)
+
+                zef._access_index = index
+
+            return zef
+
+        except:
+
+            zef_file.close()
+
+            raise
+
+    def extractall(self, path=None, members=None, pwd=None, *, workers=None, dedupe=None):
+
+        if members is None:
+
+            members = self.namelist()
+
+        if path is None:
+
+            path = os.getcwd()
+
+        else:
+
+            path = os.fspath(path)
+
+        if dedupe is not None:
+
+            return self._extractall_dedupe(path, members, pwd, workers, dedupe)
+
+        if workers is not None and workers > 1 and len(members) > 1:
+
+            return self._extractall_parallel(path, members, pwd, workers)
+
+        return self._extract_members(members, path, pwd)
+
+    def _extractall_dedupe(self, path, members, pwd, workers, dedupe):
+
+        if dedupe not in ('link', 'copy'):
+
+            raise ValueError("dedupe must be 'link' or 'copy'")
+
+        # Entries that share a local header, size and CRC inflate to the
+        # same bytes, so only the first of them is decompressed.
+        members = [m if isinstance(m, ZipInfo) else self.getinfo(m) for m in members]
+        leaders = {}
+        unique = []
+        copies = []
+
+        for index, member in enumerate(members):
+
+            if member.is_dir():
+
+                unique.append(index)
+                continue
+
+            key = (member.header_offset, member.compress_size, member.CRC,
+                   member.compress_type, member.file_size)
+            leader = leaders.setdefault(key, index)
+
+            if leader == index:
+
+                unique.append(index)
+
+            else:
+
+                copies.append((index, leader))
+
+        targets = [None] * len(members)
+        extracted = self.extractall(path, [members[i] for i in unique], pwd, workers=workers)
+
+        for index, targetpath in zip(unique, extracted):
+
+            targets[index] = targetpath
+
+        for index, leader in copies:
+
+            targets[index] = self._clone_member(members[index], path, targets[leader], dedupe)
+
+        return targets
+
+    def _extractall_parallel(self, path, members, pwd, workers):
+
+        if self._filePassed or not self.filename:
+
+            raise ValueError("Parallel extraction requires a ZipFile opened from a path")
+
+        if self.mode != 'r':
+
+            raise ValueError("Parallel extraction requires mode 'r'")
+
+        if self._limits is not None:
+
+            raise ValueError("Decompression limits can't be shared with worker processes")
+
+        members = [m if isinstance(m, ZipInfo) else self.getinfo(m) for m in members]
+        workers = min(workers, len(members))
+
+        # Balance the declared output across workers, largest members first.
+        loads = [(0, i) for i in range(workers)]
+        chunks = [[] for i in range(workers)]
+        order = sorted(range(len(members)), key=lambda i: members[i].file_size, reverse=True)
+
+        for index in order:
+
+            load, worker = heapq.heappop(loads)
+            chunks[worker].append(index)
+            heapq.heappush(loads, (load + members[index].file_size, worker))
+
+        targets = [None] * len(members)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+
+            futures = [(chunk, executor.submit(_extract_members_worker, self.filename,
+                                               [members[i] for i in chunk], path,
+                                               pwd or self.pwd, self._reopen_options(),
+                                               self._keyring))
+                       for chunk in chunks if chunk]
+
+            for chunk, future in futures:
+
+                for index, targetpath in zip(chunk, future.result()):
+
+                    targets[index] = targetpath
+
+        return targets
+
+    def _reopen_options(self):
+
+        return {'metadata_encoding': self.metadata_encoding,
+                'strict_overlap': self._strict_overlap,
+                'verify_crc': self._verify_crc,
+                'mmap': self._mmap is not None,
+                'lazy': self._lazy,
+                'columnar': self._columnar,
+                'index_cache': self._index_cache,
+                'preallocate': self._preallocate,
+                'sparse': self._sparse}
+
+    @classmethod
+    def _sanitize_windows_name(cls, arcname, pathsep):
+        
+        table = cls._windows_illegal_name_trans_table
+
+        if not table:
+
+            illegal = ':<>|"?*'
+            table = str.maketrans(illegal, '_' * len(illegal))
+            cls._windows_illegal_name_trans_table = table
+
+        arcname = arcname.translate(table)
+        
+        arcname = (x.rstrip('.') for x in arcname.split(pathsep))
+        
+        arcname = pathsep.join(x for x in arcname if x)
+
+        return arcname
+
+    def _get_targetpath(self, member, targetpath):
+
+        targetpath = os.path.join(targetpath, self._sanitize_arcname(member.filename))
+
+        return os.path.normpath(targetpath)
+
+    def _sanitize_arcname(self, filename):
+
+        arcname = filename.replace('/', os.path.sep)
+
+        if os.path.altsep:
+
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        
+        arcname = os.path.splitdrive(arcname)[1]
+        invalid_path_parts = ('', os.path.curdir, os.path.pardir)
+        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
+                                   if x not in invalid_path_parts)
+                                   
+        if os.path.sep == '\\':
+            
+            arcname = self._sanitize_windows_name(arcname, os.path.sep)
+
+        return arcname
+
+    def _get_targetpaths(self, members, targetpath):
+
+        # Returns (directory, file name) per member, with None as the name
+        # of a directory entry.  Names share few directories, so each
+        # directory part is sanitized and normalized once.
+        posix = os.path.sep == '/' and not os.path.altsep
+        dirs = {}
+        targets = []
+
+        for member in members:
+
+            head, _, tail = member.filename.rpartition('/')
+
+            if not posix or tail in (os.path.curdir, os.path.pardir):
+
+                path = self._get_targetpath(member, targetpath)
+
+                if member.is_dir():
+
+                    targets.append((path, None))
+
+                else:
+
+                    targets.append((os.path.dirname(path), os.path.basename(path)))
+
+                continue
+
+            dirpath = dirs.get(head)
+
+            if dirpath is None:
+
+                dirpath = os.path.normpath(os.path.join(targetpath, self._sanitize_arcname(head)))
+
+                if dirpath == os.path.curdir:
+
+                    dirpath = ''
+
+                dirs[head] = dirpath
+
+            if tail:
+
+                targets.append((dirpath, tail))
+
+            else:
+
+                targets.append((dirpath or os.path.curdir, None))
+
+        return targets
+
+    def _extract_members(self, members, targetpath, pwd):
+
+        members = [m if isinstance(m, ZipInfo) else self.getinfo(m) for m in members]
+        targets = self._get_targetpaths(members, targetpath)
+
+        # Every distinct directory is created once.  Only the deepest ones
+        # are passed to makedirs, which brings their ancestors along.
+        dirs = {dirpath for dirpath, name in targets if dirpath}
+        ancestors = set()
+
+        for dirpath in dirs:
+
+            parent = os.path.dirname(dirpath)
+
+            while parent and parent != dirpath and parent not in ancestors:
+
+                ancestors.add(parent)
+                dirpath, parent = parent, os.path.dirname(parent)
+
+        for dirpath in sorted(dirs - ancestors, key=len, reverse=True):
+
+            os.makedirs(dirpath, exist_ok=True)
+
+        # Files are opened relative to a descriptor of their directory, so
+        # the kernel doesn't walk the whole path again for each of them.
+        use_dir_fd = os.open in os.supports_dir_fd
+        dir_fds = {}
+        result = []
+
+        try:
+
+            for member, (dirpath, name) in zip(members, targets):
+
+                if name is None:
+
+                    result.append(dirpath)
+                    continue
+
+                opener = None
+
+                if use_dir_fd:
+
+                    dir_fd = dir_fds.get(dirpath)
+
+                    if dir_fd is None:
+
+                        if len(dir_fds) >= self._DIR_FD_CACHE:
+
+                            os.close(dir_fds.pop(next(iter(dir_fds))))
+
+                        dir_fd = dir_fds[dirpath] = os.open(dirpath or os.path.curdir,
+                                                            os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+
+                    opener = lambda path, flags: os.open(path, flags, 0o666, dir_fd=dir_fd)
+                    path = name
+
+                else:
+
+                    path = os.path.join(dirpath, name)
+
+                with self.open(member, pwd=pwd) as source, \
+                     open(path, "wb", opener=opener) as target:
+
+                    self._extract_to(member, source, target)
+
+                result.append(os.path.join(dirpath, name))
+
+        finally:
+
+            for dir_fd in dir_fds.values():
+
+                os.close(dir_fd)
+
+        return result
+
+    def _extract_member(self, member, targetpath, pwd):
+
+        if not isinstance(member, ZipInfo):
+
+            member = self.getinfo(member)
+
+        targetpath = self._get_targetpath(member, targetpath)
+        upperdirs = os.path.dirname(targetpath)
+
+        if upperdirs and not os.path.exists(upperdirs):
+
+            os.makedirs(upperdirs, exist_ok=True)
+
+        if member.is_dir():
+
+            if not os.path.isdir(targetpath):
+
+                os.makedirs(targetpath, exist_ok=True)
+
+            return targetpath
+
+        with self.open(member, pwd=pwd) as source, \
+             open(targetpath, "wb") as target:
+
+            self._extract_to(member, source, target)
+
+        return targetpath
+
+    def _extract_to(self, member, source, target):
+
+        # Reserving blocks up front would fill in the holes a sparse copy
+        # leaves, so sparse extraction skips preallocation.
+        preallocated = (self._preallocate and not self._sparse and
+                        self._preallocate_target(member, target))
+
+        try:
+
+            if self._sparse:
+
+                _copy_sparse(source, target)
+
+            elif not self._extract_stored(member, source, target):
+
+                shutil.copyfileobj(source, target)
+
+        finally:
+
+            # Give back whatever was reserved beyond the bytes written,
+            # also when the extraction fails part way.
+            if preallocated:
+
+                target.truncate()
+
+    def _preallocate_target(self, member, target):
+
+        # The declared size is only reserved when a cap of the limits bounds
+        # it and would let the member grow that large; nothing else vouches
+        # for the size, and a bomb must not fill the disk early.
+        limits = self._limits
+
+        if (not _limits_bound_size(limits) or not member.file_size or
+            not hasattr(os, 'posix_fallocate')):
+
+            return False
+
+        if (limits.max_entry_ratio is not None and
+            member.file_size > limits.max_entry_ratio * max(member.compress_size, 1)):
+
+            return False
+
+        if (limits.max_total_size is not None and
+            limits.total_size + member.file_size > limits.max_total_size):
+
+            return False
+
+        if (limits.max_ratio is not None and
+            limits.total_size + member.file_size > limits.max_ratio * max(limits.archive_size, 1)):
+
+            return False
+
+        try:
+
+            os.posix_fallocate(target.fileno(), 0, member.file_size)
+
+        except OSError:
+
+            return False
+
+        return True
+
+    def _extract_stored(self, member, source, target):
+
+        # Unencrypted stored data is copied file to file inside the kernel.
+        fileobj = source._fileobj
+
+        if (source._compress_type != ZIP_STORED or source._decrypter is not None or
+            not isinstance(fileobj, _PositionalFile) or
+            not member.compress_size or member.compress_size != member.file_size):
+
+            return False
+
+        offset = fileobj.tell()
+        count = member.compress_size
+        limits = source._limits
+
+        # The kernel copy can't stop after a chunk the way copyfileobj
+        # does, so a member that would break the limits is left to the
+        # bounded path.
+        if limits is not None and limits._would_exceed(count):
+
+            return False
+
+        target.flush()
+
+        try:
+
+            if not _copy_range(fileobj._fd, target.fileno(), offset, count):
+
+                return False
+
+        except EOFError:
+
+            raise BadZipFile("Truncated data for file %r" % member.filename) from None
+
+        # Charged only once the copy went through, so the copyfileobj
+        # fallback doesn't count the bytes twice, and after the compressed
+        # bytes are used up so the entry ratio is measured against them.
+        source._compress_left -= count
+
+        if limits is not None:
+
+            source._charge_limits(count)
+
+        if source._expected_crc is not None:
+
+            # The copied bytes never pass through Python, so the CRC takes
+            # a second read of the member, through a mapping of just its
+            # span; the page cache usually still holds it from the copy.
+            crc = crc32(b'')
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+
+            with mmap.mmap(fileobj._fd, offset + count - start, access=mmap.ACCESS_READ,
+                           offset=start) as mapped, memoryview(mapped) as view:
+
+                for pos in range(offset - start, offset - start + count, self._CRC_CHUNK):
+
+                    crc = crc32(view[pos:min(pos + self._CRC_CHUNK, offset - start + count)], crc)
+
+            if crc != source._expected_crc:
+
+                raise BadZipFile("Bad CRC-32 for file %r" % member.filename)
+
+        return True
+
+    def _clone_member(self, member, targetpath, source, dedupe):
+
+        targetpath = self._get_targetpath(member, targetpath)
+
+        if targetpath == source:
+
+            return targetpath
+
+        upperdirs = os.path.dirname(targetpath)
+
+        if upperdirs and not os.path.exists(upperdirs):
+
+            os.makedirs(upperdirs, exist_ok=True)
+
+        if os.path.lexists(targetpath):
+
+            os.unlink(targetpath)
+
+        if dedupe == 'link':
+
+            try:
+
+                os.link(source, targetpath)
+
+                return targetpath
+
+            except OSError:
+
+                pass
+
+        _clone_file(source, targetpath)
+
+        return targetpath
+
+    def _writecheck(self, zinfo):
+        
+        if zinfo.filename in self.NameToInfo:
+
+            warnings.warn('Duplicate name: %r' % zinfo.filename, stacklevel=3)
+
+        if self.mode not in ('w', 'x', 'a'):
+
+            raise ValueError("write() requires mode 'w', 'x', or 'a'")
+
+        if not self.fp:
+
+            raise ValueError("Attempt to write ZIP archive that was already closed")
+
+        _check_compression(zinfo.compress_type)
+
+        if not self._allowZip64:
+
+            requires_zip64 = None
+
+            if len(self.filelist) >= ZIP_FILECOUNT_LIMIT:
+
+                requires_zip64 = "Files count"
+
+            elif zinfo.file_size > ZIP64_LIMIT:
+
+                requires_zip64 = "Filesize"
+
+            elif zinfo.header_offset > ZIP64_LIMIT:
+
+                requires_zip64 = "Zipfile size"
+
+            if requires_zip64:
+
+                raise LargeZipFile(requires_zip64 + " would require ZIP64 extensions")
+
+    def _open_to_write(self, zinfo, force_zip64=False, workers=None):
+
+        if force_zip64 and not self._allowZip64:
+
+            raise ValueError("force_zip64 is True, but allowZip64 was False when opening the ZIP file.")
+
+        if self._writing:
+
+            raise ValueError("Can't write to the ZIP file while there is "
+                             "another write handle open on it. "
+                             "Close the first handle before opening another.")
+
+        zinfo.compress_size = 0
+        zinfo.CRC = 0
+        zinfo.flag_bits = 0x00
+
+        if zinfo.compress_type == ZIP_LZMA:
+
+            zinfo.flag_bits |= _MASK_COMPRESS_OPTION_1
+
+        # A pipe or socket can't be rewound to patch the local header, so
+        # sizes and CRC follow the data in a descriptor instead.
+        if not self._seekable:
+
+            zinfo.flag_bits |= _MASK_USE_DATA_DESCRIPTOR
+
+        if not zinfo.external_attr:
+
+            zinfo.external_attr = 0o600 << 16
+
+        # Compressed data can come out larger than the input.
+        zip64 = force_zip64 or (zinfo.file_size * 1.05 > ZIP64_LIMIT)
+
+        if not self._allowZip64 and zip64:
+
+            raise LargeZipFile("Filesize would require ZIP64 extensions")
+
+        if self._seekable:
+
+            self.fp.seek(self.start_dir)
+
+        zinfo.header_offset = self.fp.tell()
+
+        self._writecheck(zinfo)
+        self._didModify = True
+
+        self.fp.write(zinfo.FileHeader(zip64))
+
+        self._writing = True
+
+        return _ZipWriteFile(self, zinfo, zip64, workers)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None, *, workers=None):
+
+        if not self.fp:
+
+            raise ValueError("Attempt to write to ZIP archive that was already closed")
+
+        if self._writing:
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+        zinfo = ZipInfo.from_file(filename, arcname, strict_timestamps=self._strict_timestamps)
+
+        if zinfo.is_dir():
+
+            zinfo.compress_size = 0
+            zinfo.CRC = 0
+            self.mkdir(zinfo)
+
+        else:
+
+            if compress_type is not None:
+
+                zinfo.compress_type = compress_type
+
+            else:
+
+                zinfo.compress_type = self.compression
+
+            if compresslevel is not None:
+
+                zinfo._compresslevel = compresslevel
+
+            else:
+
+                zinfo._compresslevel = self.compresslevel
+
+            with open(filename, "rb") as src, self.open(zinfo, 'w', workers=workers) as dest:
+                shutil.copyfileobj(src, dest, 1024*8)
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+
+        if isinstance(data, str):
+
+            data = data.encode("utf-8")
+
+        if not isinstance(zinfo_or_arcname, ZipInfo):
+
+            zinfo = ZipInfo(filename=zinfo_or_arcname, date_time=time.localtime(time.time())[:6])
+            zinfo.compress_type = self.compression
+            zinfo._compresslevel = self.compresslevel
+
+            if zinfo.filename.endswith('/'):
+
+                zinfo.external_attr = 0o40775 << 16
+                zinfo.external_attr |= 0x10
+
+            else:
+
+                zinfo.external_attr = 0o600 << 16
+
+        else:
+
+            zinfo = zinfo_or_arcname
+
+        if not self.fp:
+
+            raise ValueError("Attempt to write to ZIP archive that was already closed")
+
+        if self._writing:
+
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists.")
+
+        if compress_type is not None:
+
+            zinfo.compress_type = compress_type
+
+        if compresslevel is not None:
+
+            zinfo._compresslevel = compresslevel
+
+        zinfo.file_size = len(data)
+
+        with self._lock:
+
+            with self.open(zinfo, mode='w') as dest:
+
+                dest.write(data)
+
+    def write_many(self, filenames, arcnames=None, compress_type=None, compresslevel=None, *, workers=None):
+
+        if not self.fp:
+
+            raise ValueError("Attempt to write to ZIP archive that was already closed")
+
+        if self._writing:
+
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+        if arcnames is None:
+
+            arcnames = itertools.repeat(None)
+
+        if compress_type is None:
+
+            compress_type = self.compression
+
+        if compresslevel is None:
+
+            compresslevel = self.compresslevel
+
+        _check_compression(compress_type)
+        workers = workers or os.cpu_count() or 1
+
+        # Members are compressed on the pool into spooled buffers and
+        # appended in input order; the window bounds how many finished
+        # buffers can wait for their turn.
+        window = collections.deque()
+
+        with ThreadPoolExecutor(workers) as executor:
+
+            try:
+
+                for filename, arcname in zip(filenames, arcnames):
+
+                    zinfo = ZipInfo.from_file(filename, arcname, strict_timestamps=self._strict_timestamps)
+
+                    if zinfo.is_dir():
+
+                        window.append((zinfo, None))
+
+                    else:
+
+                        zinfo.compress_type = compress_type
+                        zinfo._compresslevel = compresslevel
+                        window.append((zinfo, executor.submit(_compress_file, filename,
+                                                              compress_type, compresslevel)))
+
+                    while len(window) > 2 * workers:
+
+                        self._write_compressed(*window.popleft())
+
+                while window:
+
+                    self._write_compressed(*window.popleft())
+
+            finally:
+
+                for zinfo, future in window:
+
+                    if future is not None and not future.cancel() and not future.exception():
+
+                        future.result()[3].close()
+
+    def _write_compressed(self, zinfo, future):
+
+        if future is None:
+
+            zinfo.compress_size = 0
+            zinfo.CRC = 0
+            self.mkdir(zinfo)
+
+            return
+
+        crc, file_size, compress_size, spool = future.result()
+
+        with spool, self._lock:
+
+            zinfo.CRC = crc
+            zinfo.file_size = file_size
+            zinfo.compress_size = compress_size
+            zinfo.flag_bits = 0x00
+
+            if zinfo.compress_type == ZIP_LZMA:
+
+                zinfo.flag_bits |= _MASK_COMPRESS_OPTION_1
+
+            zip64 = file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT
+
+            if zip64 and not self._allowZip64:
+
+                raise LargeZipFile("Filesize would require ZIP64 extensions")
+
+            if self._seekable:
+
+                self.fp.seek(self.start_dir)
+
+            zinfo.header_offset = self.fp.tell()
+
+            self._writecheck(zinfo)
+            self._didModify = True
+
+            # Sizes and CRC are known up front, so no descriptor is needed
+            # even when the output can't seek.
+            self.fp.write(zinfo.FileHeader(zip64))
+            shutil.copyfileobj(spool, self.fp, 1 << 20)
+            self.start_dir = self.fp.tell()
+            self.filelist.append(zinfo)
+            self.NameToInfo[zinfo.filename] = zinfo
+
+    def mkdir(self, zinfo_or_directory_name, mode=511):
+        
+        if isinstance(zinfo_or_directory_name, ZipInfo):
+
+            zinfo = zinfo_or_directory_name
+
+            if not zinfo.is_dir():
+
+                raise ValueError("The given ZipInfo does not describe a directory")
+
+        elif isinstance(zinfo_or_directory_name, str):
+
+            directory_name = zinfo_or_directory_name
+
+            if not directory_name.endswith("/"):
+
+                directory_name += "/"
+
+            zinfo = ZipInfo(directory_name)
+            zinfo.compress_size = 0
+            zinfo.CRC = 0
+            zinfo.external_attr = ((0o40000 | mode) & 0xFFFF) << 16
+            zinfo.file_size = 0
+            zinfo.external_attr |= 0x10
+
+        else:
+
+            raise TypeError("Expected type str or ZipInfo")
+
+        with self._lock:
+
+            if self._seekable:
+
+                self.fp.seek(self.start_dir)
+
+            zinfo.header_offset = self.fp.tell()
+
+            if zinfo.compress_type == ZIP_LZMA:
+            
+                zinfo.flag_bits |= _MASK_COMPRESS_OPTION_1
+
+            self._writecheck(zinfo)
+            self._didModify = True
+
+            self.filelist.append(zinfo)
+            self.NameToInfo[zinfo.filename] = zinfo
+            self.fp.write(zinfo.FileHeader(False))
+            self.start_dir = self.fp.tell()
+
+    def __del__(self):
+        
+        self.close()
+
+    def close(self):
+
+        if self.fp is None:
+
+            return
+
+        if self._writing:
+
+            raise ValueError("Can't close the ZIP file while there is "
+                             "an open writing handle on it. "
+                             "Close the writing handle before closing the zip.")
+
+        try:
+
+            if self.mode in ('w', 'x', 'a') and self._didModify: # write ending records
+
+                with self._lock:
+
+                    if self._seekable:
+
+                        self.fp.seek(self.start_dir)
+
+                    self._write_end_record()
+
+        finally:
+
+            fp = self.fp
+            self.fp = None
+            self._fpclose(fp)
+
+    def _write_end_record(self):
+
+        for zinfo in self.filelist:
+
+            dt = zinfo.date_time
+            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+            extra = []
+
+            if zinfo.file_size > ZIP64_LIMIT \
+               or zinfo.compress_size > ZIP64_LIMIT:
+                extra.append(zinfo.file_size)
+                extra.append(zinfo.compress_size)
+                file_size = 0xffffffff
+                compress_size = 0xffffffff
+
+            else:
+
+                file_size = zinfo.file_size
+                compress_size = zinfo.compress_size
+
+            if zinfo.header_offset > ZIP64_LIMIT:
+
+                extra.append(zinfo.header_offset)
+                header_offset = 0xffffffff
+
+            else:
+
+                header_offset = zinfo.header_offset
+
+            extra_data = zinfo.extra
+            min_version = 0
+
+            if extra:
+                
+                extra_data = _strip_extra(extra_data, (1,))
+                extra_data = struct.pack(
+                    '<HH' + 'Q'*len(extra),
+                    1, 8*len(extra), *extra) + extra_data
+
+                min_version = ZIP64_VERSION
+
+            if zinfo.compress_type == ZIP_BZIP2:
+
+                min_version = max(BZIP2_VERSION, min_version)
+
+            elif zinfo.compress_type == ZIP_LZMA:
+
+                min_version = max(LZMA_VERSION, min_version)
+
+            extract_version = max(min_version, zinfo.extract_version)
+            create_version = max(min_version, zinfo.create_version)
+            filename, flag_bits = zinfo._encodeFilenameFlags()
+            centdir = struct.pack(structCentralDir,
+                                  stringCentralDir, create_version,
+                                  zinfo.create_system, extract_version, zinfo.reserved,
+                                  flag_bits, zinfo.compress_type, dostime, dosdate,
+                                  zinfo.CRC, compress_size, file_size,
+                                  len(filename), len(extra_data), len(zinfo.comment),
+                                  0, zinfo.internal_attr, zinfo.external_attr,
+                                  header_offset)
+            self.fp.write(centdir)
+            self.fp.write(filename)
+            self.fp.write(extra_data)
+            self.fp.write(zinfo.comment)
+
+        pos2 = self.fp.tell()
+        
+        centDirCount = len(self.filelist)
+        centDirSize = pos2 - self.start_dir
+        centDirOffset = self.start_dir
+        requires_zip64 = None
+
+        if centDirCount > ZIP_FILECOUNT_LIMIT:
+
+            requires_zip64 = "Files count"
+
+        elif centDirOffset > ZIP64_LIMIT:
+
+            requires_zip64 = "Central directory offset"
+
+        elif centDirSize > ZIP64_LIMIT:
+
+            requires_zip64 = "Central directory size"
+
+        if requires_zip64:
+            
+            if not self._allowZip64:
+
+                raise LargeZipFile(requires_zip64 + " would require ZIP64 extensions")
+                
+            zip64endrec = struct.pack(
+                structEndArchive64, stringEndArchive64,
+                44, 45, 45, 0, 0, centDirCount, centDirCount,
+                centDirSize, centDirOffset)
+            self.fp.write(zip64endrec)
+
+            zip64locrec = struct.pack(
+                structEndArchive64Locator,
+                stringEndArchive64Locator, 0, pos2, 1)
+            self.fp.write(zip64locrec)
+            centDirCount = min(centDirCount, 0xFFFF)
+            centDirSize = min(centDirSize, 0xFFFFFFFF)
+            centDirOffset = min(centDirOffset, 0xFFFFFFFF)
+
+        endrec = struct.pack(structEndArchive, stringEndArchive,
+                             0, 0, centDirCount, centDirCount,
+                             centDirSize, centDirOffset, len(self._comment))
+        self.fp.write(endrec)
+        self.fp.write(self._comment)
+
+        if self.mode == "a":
+
+            self.fp.truncate()
+
+        self.fp.flush()
+
+    def _fpclose(self, fp):
+        
+        assert self._fileRefCnt > 0
+        self._fileRefCnt -= 1
+
+        if not self._fileRefCnt and self._mmap is not None:
+
+            if isinstance(self._table, _CentralDirTable):
+
+                self._table._detach()
+
+            self._mmap.close()
+
+        if not self._fileRefCnt and not self._filePassed:
+
+            fp.close()
+
+_async_executor = None
+_async_executor_lock = threading.Lock()
+_ASYNC_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+def _get_async_executor():
+
+    # One pool is shared by every AsyncZipFile, so the number of threads
+    # stays bounded however many archives are open.
+    global _async_executor
+
+    with _async_executor_lock:
+
+        if _async_executor is None:
+
+            _async_executor = ThreadPoolExecutor(_ASYNC_WORKERS,
+                                                 thread_name_prefix='AsyncZipFile')
+
+        return _async_executor
+
+class AsyncZipFile:
+
+    _EXTRACT_BATCH = 64
+
+    # Everything that may block runs on an executor, shared by all archives
+    # unless one is given.  At most max_concurrency such calls are in
+    # flight for the archive, so one busy archive can't take the whole pool.
+    def __init__(self, file, *, max_concurrency=8, executor=None, **kwargs):
+
+        if max_concurrency < 1:
+
+            raise ValueError("max_concurrency must be at least 1")
+
+        self._file = file
+        self._kwargs = kwargs
+        self._zipfile = None
+        self._closed = False
+        self._max_concurrency = max_concurrency
+        self._executor = executor
+        self._load_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+
+        return await self.load()
+
+    async def __aexit__(self, type, value, traceback):
+
+        await self.close()
+
+    async def _run(self, func, *args):
+
+        if self._closed:
+
+            raise ValueError("Attempt to use ZIP archive that was already closed")
+
+        if self._executor is None:
+
+            self._executor = _get_async_executor()
+
+        async with self._semaphore:
+
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def load(self):
+
+        if self._zipfile is None:
+
+            async with self._load_lock:
+
+                if self._zipfile is None:
+
+                    self._zipfile = await self._run(lambda: ZipFile(self._file, 'r', **self._kwargs))
+
+        return self
+
+    def _archive(self):
+
+        if self._zipfile is None:
+
+            raise ValueError("Archive is not loaded, use 'async with' or await load()")
+
+        return self._zipfile
+
+    def namelist(self):
+
+        return self._archive().namelist()
+
+    def infolist(self):
+
+        return self._archive().infolist()
+
+    def getinfo(self, name):
+
+        return self._archive().getinfo(name)
+
+    def setkeyring(self, passwords):
+
+        self._archive().setkeyring(passwords)
+
+    async def open(self, name, pwd=None, **kwargs):
+
+        await self.load()
+        zf = self._zipfile
+
+        return AsyncZipExtFile(self, await self._run(lambda: zf.open(name, 'r', pwd, **kwargs)))
+
+    async def read(self, name, pwd=None):
+
+        await self.load()
+
+        return await self._run(self._zipfile.read, name, pwd)
+
+    async def iter_chunks(self, name, pwd=None, chunk_size=None):
+
+        async with await self.open(name, pwd) as source:
+
+            async for data in source.iter_chunks(chunk_size):
+
+                yield data
+
+    async def extract(self, member, path=None, pwd=None):
+
+        await self.load()
+
+        if path is None:
+
+            path = os.getcwd()
+
+        else:
+
+            path = os.fspath(path)
+
+        targets = await self._run(self._zipfile._extract_members, [member], path, pwd)
+
+        return targets[0]
+
+    async def extractall(self, path=None, members=None, pwd=None):
+
+        await self.load()
+        zf = self._zipfile
+
+        if members is None:
+
+            members = zf.namelist()
+
+        if path is None:
+
+            path = os.getcwd()
+
+        else:
+
+            path = os.fspath(path)
+
+        # Members go to the executor in runs of neighbours, each extracted
+        # by one _extract_members call that shares its directory work.  A
+        # fixed set of drains take the runs from one iterator, so a large
+        # archive doesn't turn into one pending coroutine per member.
+        members = list(members)
+        step = max(1, min(self._EXTRACT_BATCH, -(-len(members) // self._max_concurrency)))
+        targets = [None] * len(members)
+        pending = iter(range(0, len(members), step))
+
+        async def drain():
+
+            for start in pending:
+
+                batch = members[start:start + step]
+                targets[start:start + step] = await self._run(zf._extract_members, batch, path, pwd)
+
+        tasks = [asyncio.ensure_future(drain())
+                 for i in range(min(self._max_concurrency, -(-len(members) // step)))]
+
+        try:
+
+            await asyncio.gather(*tasks)
+
+        except BaseException:
+
+            for task in tasks:
+
+                task.cancel()
+
+            raise
+
+        return targets
+
+    async def close(self):
 
-        finally:
+        if self._closed:
 
-            self._zipfile._writing = False
+            return
 
-class ZipFile:
+        try:
 
-    fp = None
-    _windows_illegal_name_trans_table = None
+            if self._zipfile is not None:
 
-    def __init__(self, file, mode="r", compression=ZIP_STORED, allowZip64=True,
-                 compresslevel=None, *, strict_timestamps=True, metadata_encoding=None):
-        
-        if mode not in ('r', 'w', 'x', 'a'):
+                await self._run(self._zipfile.close)
 
-            raise ValueError("ZipFile requires mode 'r', 'w', 'x', or 'a'")
+        finally:
 
-        _check_compression(compression)
+            self._closed = True
 
-        self._allowZip64 = allowZip64
-        self._didModify = False
-        self.debug = 0
-        self.NameToInfo = {}
-        self.filelist = []
-        self.compression = compression
-        self.compresslevel = compresslevel
-        self.mode = mode
-        self.pwd = None
-        self._comment = b''
-        self._strict_timestamps = strict_timestamps
-        self.metadata_encoding = metadata_encoding
+class AsyncZipExtFile:
 
-        if self.metadata_encoding and mode != 'r':
-            
-            raise ValueError("metadata_encoding is only supported for reading files")
+    CHUNK_SIZE = 1 << 20
 
-        if isinstance(file, os.PathLike):
+    def __init__(self, archive, fileobj):
 
-            file = os.fspath(file)
+        self._archive = archive
+        self._fileobj = fileobj
+        self._lock = asyncio.Lock()
+        self.name = fileobj.name
 
-        if isinstance(file, str):
-            
-            self._filePassed = 0
-            self.filename = file
-            modeDict = {'r' : 'rb', 'w': 'w+b', 'x': 'x+b', 'a' : 'r+b',
-                        'r+b': 'w+b', 'w+b': 'wb', 'x+b': 'xb'}
+    async def __aenter__(self):
 
-            filemode = modeDict[mode]
+        return self
 
-            while True:
+    async def __aexit__(self, type, value, traceback):
 
-                try:
+        await self.close()
 
-                    self.fp = io.open(file, filemode)
+    def __aiter__(self):
 
-                except OSError:
+        return self.iter_chunks()
 
-                    if filemode in modeDict:
-                        
-                        filemode = modeDict[filemode]
-                        continue
+    async def _run(self, func, *args):
 
-                    raise
+        # One handle is never driven from two threads at once.
+        async with self._lock:
 
-                break
+            return await self._archive._run(func, *args)
 
-        else:
+    @property
+    def closed(self):
 
-            self._filePassed = 1
-            self.fp = file
-            self.filename = getattr(file, 'name', None)
+        return self._fileobj.closed
 
-        self._fileRefCnt = 1
-        self._lock = threading.RLock()
-        self._seekable = True
-        self._writing = False
+    async def read(self, n=-1):
 
-        try:
+        return await self._run(self._fileobj.read, n)
 
-            if mode == 'r':
+    async def read1(self, n=-1):
 
-                self._RealGetContents()
+        return await self._run(self._fileobj.read1, n)
 
-            elif mode in ('w', 'x'):
-                
-                self._didModify = True
+    async def readinto(self, b):
 
-                try:
+        return await self._run(self._fileobj.readinto, b)
 
-                    self.start_dir = self.fp.tell()
+    async def seek(self, offset, whence=0):
 
-                except (AttributeError, OSError):
+        return await self._run(self._fileobj.seek, offset, whence)
 
-                    self.fp = _Tellable(self.fp)
-                    self.start_dir = 0
-                    self._seekable = False
+    def tell(self):
 
-                else:
-                    
-                    try:
+        return self._fileobj.tell()
 
-                        self.fp.seek(self.start_dir)
+    async def iter_chunks(self, chunk_size=None):
 
-                    except (AttributeError, OSError):
+        chunk_size = chunk_size or self.CHUNK_SIZE
 
-                        self._seekable = False
+        while True:
 
-            elif mode == 'a':
+            data = await self.read(chunk_size)
 
-                try:
-                    
-                    self._RealGetContents()                    
-                    self.fp.seek(self.start_dir)
-                    
-                except BadZipFile:
-                    
-                    self.fp.seek(0, 2)
-                    self._didModify = True
-                    self.start_dir = self.fp.tell()
+            if not data:
 
-            else:
+                return
 
-                raise ValueError("Mode must be 'r', 'w', 'x', or 'a'")
+            yield data
 
-        except:
+    async def close(self):
 
-            fp = self.fp
-            self.fp = None
-            self._fpclose(fp)
+        if not self._fileobj.closed:
 
-            raise
+            await self._run(self._fileobj.close)
 
-    def __enter__(self):
+class _StreamReader:
 
-        return self
+    # A forward-only file that counts what it hands out and takes back
+    # bytes read past the end of a member.  read() returns whatever one
+    # underlying read gives, so a member never waits on later members.
+    def __init__(self, fileobj):
 
-    def __exit__(self, type, value, traceback):
+        self._fileobj = fileobj
+        self._read1 = getattr(fileobj, 'read1', fileobj.read)
+        self._pushback = collections.deque()
+        self._pos = 0
 
-        self.close()
+    def seekable(self):
 
-    def __repr__(self):
+        return False
 
-        result = ['<%s.%s' % (self.__class__.__module__, self.__class__.__qualname__)]
+    def tell(self):
 
-        if self.fp is not None:
+        return self._pos
 
-            if self._filePassed:
+    def read(self, n):
 
-                result.append(' file=%r' % self.fp)
+        if self._pushback:
 
-            elif self.filename is not None:
+            chunk = self._pushback.popleft()
 
-                result.append(' filename=%r' % self.filename)
+            if len(chunk) > n:
 
-            result.append(' mode=%r' % self.mode)
+                self._pushback.appendleft(chunk[n:])
+                chunk = chunk[:n]
 
-        else:
+            data = bytes(chunk)
 
-            result.append(' [closed]')
-            
-        result.append('>')
+            if len(data) < n and not self._pushback:
 
-        return ''.join(result)
+                # Don't hand back just the few bytes held over from the
+                # last read.
+                data += self._read1(n - len(data))
 
-    def _RealGetContents(self):
-        
-        fp = self.fp
+        else:
 
-        try:
+            data = self._read1(n)
 
-            endrec = _EndRecData(fp)
+        self._pos += len(data)
 
-        except OSError:
+        return data
 
-            raise BadZipFile("File is not a zip file")
+    def read_exact(self, n):
 
-        if not endrec:
+        chunks = []
 
-            raise BadZipFile("File is not a zip file")
+        while n > 0:
 
-        if self.debug > 1:
+            data = self.read(n)
 
-            print(endrec)
+            if not data:
 
-        size_cd = endrec[_ECD_SIZE]
-        offset_cd = endrec[_ECD_OFFSET]
-        self._comment = endrec[_ECD_COMMENT]
+                break
 
-        concat = endrec[_ECD_LOCATION] - size_cd - offset_cd
+            chunks.append(data)
+            n -= len(data)
 
-        if endrec[_ECD_SIGNATURE] == stringEndArchive64:
-        
-            concat -= (sizeEndCentDir64 + sizeEndCentDir64Locator)
+        return b''.join(chunks)
 
-        if self.debug > 2:
+    def unread(self, data):
 
-            inferred = concat + offset_cd
-            print("given, inferred, offset", offset_cd, inferred, concat)
-        
-        self.start_dir = offset_cd + concat
+        if data:
 
-        if self.start_dir < 0:
+            self._pushback.appendleft(memoryview(bytes(data)))
+            self._pos -= len(data)
 
-            raise BadZipFile("Bad offset for central directory")
+    def skip(self, n):
 
-        fp.seek(self.start_dir, 0)
-        data = fp.read(size_cd)
-        fp = io.BytesIO(data)
-        total = 0
+        while n > 0:
 
-        while total < size_cd:
+            data = self.read(min(n, 1 << 20))
 
-            centdir = fp.read(sizeCentralDir)
+            if not data:
 
-            if len(centdir) != sizeCentralDir:
+                raise EOFError
 
-                raise BadZipFile("Truncated central directory")
+            n -= len(data)
 
-            centdir = struct.unpack(structCentralDir, centdir)
+class _StreamedExtFile(ZipExtFile):
 
-            if centdir[_CD_SIGNATURE] != stringCentralDir:
+    # A member whose sizes and CRC follow the data in a data descriptor.
+    # The decompressor finds the end of compressed data; stored data ends
+    # at the first descriptor whose compressed size matches the bytes read.
+    # Reads are capped at WINDOW, so what goes past the end and has to
+    # be pushed back stays small however much the caller asks for.
+    WINDOW = 1 << 18
 
-                raise BadZipFile("Bad magic number for central directory")
+    def __init__(self, reader, zinfo, pwd, limits, zip64):
 
-            if self.debug > 2:
+        start = reader.tell()
+        super().__init__(reader, 'r', zinfo, pwd, limits=limits)
+        consumed = self._compress_size - self._compress_left
+        self._compress_size = sys.maxsize
+        self._compress_left = sys.maxsize - consumed
+        self._left = sys.maxsize
+        self._zinfo = zinfo
+        self._zip64 = zip64
+        self._start = start
+        self._pending = b''
 
-                print(centdir)
+    def _charge_limits(self, nbytes):
 
-            filename = fp.read(centdir[_CD_FILENAME_LENGTH])
-            flags = centdir[_CD_FLAG_BITS]
+        # The archive size isn't known up front; max_ratio is measured
+        # against what has been read of the stream so far.
+        self._limits.archive_size = max(self._limits.archive_size, self._fileobj.tell())
+        super()._charge_limits(nbytes)
 
-            if flags & _MASK_UTF_FILENAME:
-                
-                filename = filename.decode('utf-8')
+    def _read1(self, n):
 
-            else:
-                
-                filename = filename.decode(self.metadata_encoding or 'cp437')
-            
-            x = ZipInfo(filename)
-            x.extra = fp.read(centdir[_CD_EXTRA_FIELD_LENGTH])
-            x.comment = fp.read(centdir[_CD_COMMENT_LENGTH])
-            x.header_offset = centdir[_CD_LOCAL_HEADER_OFFSET]
-            (x.create_version, x.create_system, x.extract_version, x.reserved,
-             x.flag_bits, x.compress_type, t, d,
-             x.CRC, x.compress_size, x.file_size) = centdir[1:12]
+        if self._compress_type != ZIP_STORED or self._eof or n <= 0:
 
-            if x.extract_version > MAX_EXTRACT_VERSION:
+            return super()._read1(n)
 
-                raise NotImplementedError("zip file version %.1f" % (x.extract_version / 10))
+        if self._limits is not None:
 
-            x.volume, x.internal_attr, x.external_attr = centdir[15:18]
-            
-            x._raw_time = t
-            x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
-                            t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
+            n = min(n, self.MAX_LIMITED_READ)
 
-            x._decodeExtra()
-            x.header_offset = x.header_offset + concat
-            self.filelist.append(x)
-            self.NameToInfo[x.filename] = x
+        size = 24 if self._zip64 else 16
+        buf = self._fileobj.read(min(max(n, self.MIN_READ_SIZE), self.WINDOW) + size)
 
-            total = (total + sizeCentralDir + centdir[_CD_FILENAME_LENGTH]
-                     + centdir[_CD_EXTRA_FIELD_LENGTH]
-                     + centdir[_CD_COMMENT_LENGTH])
+        if len(buf) < size:
 
-            if self.debug > 2:
+            buf += self._fileobj.read_exact(size - len(buf))
 
-                print("total", total)
+            if len(buf) < size:
 
-    def namelist(self):
-        
-        return [data.filename for data in self.filelist]
+                raise EOFError
 
-    def getinfo(self, name):
-        
-        info = self.NameToInfo.get(name)
+        consumed = self._fileobj.tell() - len(buf) - self._start
+        signature = struct.pack('<L', _DD_SIGNATURE)
+        pos = buf.find(signature)
 
-        if info is None:
+        while 0 <= pos <= len(buf) - size:
 
-            raise KeyError('There is no item named %r in the archive' % name)
+            if struct.unpack_from('<Q' if self._zip64 else '<L', buf, pos + 8)[0] == consumed + pos:
 
-        return info
+                self._eof = True
+                break
 
-    @property
-    def comment(self):
-        
-        return self._comment
+            pos = buf.find(signature, pos + 1)
 
-    @comment.setter
-    def comment(self, comment):
-        
-        if not isinstance(comment, bytes):
-            
-            raise TypeError("comment: expected bytes, got %s" % type(comment).__name__)
-        
-        if len(comment) > ZIP_MAX_COMMENT:
+        else:
 
-            import warnings
-            warnings.warn('Archive comment is too long; truncating to %d bytes' % ZIP_MAX_COMMENT, stacklevel=2)
-            comment = comment[:ZIP_MAX_COMMENT]
+            # A descriptor may start in the last few bytes; look again
+            # once more data has arrived.
+            pos = len(buf) - size + 1
 
-        self._comment = comment
-        self._didModify = True
+        self._fileobj.unread(buf[pos:])
+        data = buf[:pos]
+        self._compress_left -= len(data)
 
-    def read(self, name, pwd=None):
-        
-        with self.open(name, "r", pwd) as fp:
+        if self._decrypter is not None:
 
-            return fp.read()
+            data = self._decrypter(data)
 
-    def open(self, name, mode="r", pwd=None, *, force_zip64=False):
-        
-        if mode not in {"r", "w"}:
+        self._left -= len(data)
 
-            raise ValueError('open() requires mode "r" or "w"')
+        if self._limits is not None:
 
-        if pwd and (mode == "w"):
+            self._charge_limits(len(data))
 
-            raise ValueError("pwd is only supported for reading files")
+        self._update_crc(data)
 
-        if not self.fp:
+        return data
 
-            raise ValueError("Attempt to use ZIP archive that was already closed")
+    def _read2(self, n):
 
-        if isinstance(name, ZipInfo):
+        data = self._fileobj.read(min(max(n, self.MIN_READ_SIZE), self.WINDOW))
+        tail = getattr(self._decompressor, 'unconsumed_tail', b'')
 
-            zinfo = name
+        # The end of the stream may already be waiting in the unconsumed
+        # input, so running out is only an error without any.
+        if not data and not tail:
 
-        elif mode == 'w':
+            raise EOFError
 
-            zinfo = ZipInfo(name)
-            zinfo.compress_type = self.compression
-            zinfo._compresslevel = self.compresslevel
+        self._compress_left -= len(data)
 
-        else:
-            
-            zinfo = self.getinfo(name)
+        # Keep the raw bytes behind the decompressor's pending input, so
+        # what it doesn't consume can go back to the stream.
+        if tail:
 
-        if mode == 'w':
+            self._pending = self._pending[len(self._pending) - len(tail):]
 
-            return self._open_to_write(zinfo, force_zip64=force_zip64)
+        elif getattr(self._decompressor, 'needs_input', True):
 
-        if self._writing:
+            self._pending = b''
 
-            raise ValueError("Can't read from the ZIP file while there "
-                    "is an open writing handle on it. "
-                    "Close the writing handle before trying to read.")
+        self._pending += data
 
-        self._fileRefCnt += 1
-        zef_file = _SharedFile(self.fp, zinfo.header_offset, self._fpclose, self._lock, lambda: self._writing)
-        
-        try:
-            
-            fheader = zef_file.read(sizeFileHeader)
+        if self._decrypter is not None:
 
-            if len(fheader) != sizeFileHeader:
+            data = self._decrypter(data)
 
-                raise BadZipFile("Truncated file header")
+        return data
 
-            fheader = struct.unpack(structFileHeader, fheader)
+    def _update_crc(self, newdata):
 
-            if fheader[_FH_SIGNATURE] != stringFileHeader:
+        self._running_crc = crc32(newdata, self._running_crc)
 
-                raise BadZipFile("Bad magic number for file header")
+        if self._eof:
 
-            fname = zef_file.read(fheader[_FH_FILENAME_LENGTH])
+            self._read_descriptor()
 
-            if fheader[_FH_EXTRA_FIELD_LENGTH]:
+    def _read_descriptor(self):
 
-                zef_file.read(fheader[_FH_EXTRA_FIELD_LENGTH])
+        # zlib's flush() after the end of the stream appends the leftover
+        # still held as unconsumed_tail to unused_data a second time.
+        unused = (len(getattr(self._decompressor, 'unused_data', b'')) -
+                  len(getattr(self._decompressor, 'unconsumed_tail', b'')))
 
-            if zinfo.flag_bits & _MASK_COMPRESSED_PATCH:
-                
-                raise NotImplementedError("compressed patched data (flag bit 5)")
+        if unused:
 
-            if zinfo.flag_bits & _MASK_STRONG_ENCRYPTION:
-                
-                raise NotImplementedError("strong encryption (flag bit 6)")
+            self._fileobj.unread(self._pending[len(self._pending) - unused:])
 
-            if fheader[_FH_GENERAL_PURPOSE_FLAG_BITS] & _MASK_UTF_FILENAME:
-                
-                fname_str = fname.decode("utf-8")
-                
-            else:
+        self._pending = b''
+        compress_size = self._fileobj.tell() - self._start
+        file_size = sys.maxsize - self._left
+        fmt = '<LQQ' if self._zip64 else '<LLL'
+        data = self._fileobj.read_exact(4)
 
-                fname_str = fname.decode(self.metadata_encoding or "cp437")
+        if data != struct.pack('<L', _DD_SIGNATURE):
 
-            if fname_str != zinfo.orig_filename:
-                
-                raise BadZipFile(
-                    'File name in directory %r and header %r differ.'
-                    % (zinfo.orig_filename, fname))
+            self._fileobj.unread(data)
 
-            is_encrypted = zinfo.flag_bits & _MASK_ENCRYPTED
+        data = self._fileobj.read_exact(struct.calcsize(fmt))
 
-            if is_encrypted:
+        if len(data) != struct.calcsize(fmt):
 
-                if not pwd:
+            raise BadZipFile("Truncated data descriptor for file %r" % self.name)
 
-                    pwd = self.pwd
+        crc, dd_compress_size, dd_file_size = struct.unpack(fmt, data)
 
-                if pwd and not isinstance(pwd, bytes):
+        if dd_compress_size != compress_size or dd_file_size != file_size:
 
-                    raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
+            raise BadZipFile("Bad data descriptor for file %r" % self.name)
 
-                if not pwd:
+        if crc != self._running_crc:
 
-                    raise RuntimeError("File %r is encrypted, password "
-                                       "required for extraction" % name)
+            raise BadZipFile("Bad CRC-32 for file %r" % self.name)
 
-            else:
+        self._zinfo.CRC = crc
+        self._zinfo.compress_size = compress_size
+        self._zinfo.file_size = file_size
 
-                pwd = None
+class ZipStreamReader:
 
-            return ZipExtFile(zef_file, mode, zinfo, pwd, True)
+    # Walks local file headers in order, so an archive can be read from a
+    # pipe or socket as it arrives.  Each member must be read before the
+    # next one is requested; whatever is left of it is skipped.
+    def __init__(self, fileobj, pwd=None, *, metadata_encoding=None, limits=None):
 
-        except:
+        if pwd and not isinstance(pwd, bytes):
 
-            zef_file.close()
+            raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
 
-            raise
+        self._reader = _StreamReader(fileobj)
+        self.pwd = pwd
+        self.metadata_encoding = metadata_encoding
+        self._limits = limits
 
-    def extractall(self, path=None, members=None, pwd=None):
+    def __iter__(self):
 
-        if members is None:
+        while True:
 
-            members = self.namelist()
+            header = self._read_local_header()
 
-        if path is None:
+            if header is None:
 
-            path = os.getcwd()
+                return
 
-        else:
+            zinfo, zip64 = header
+            stream = self._open_member(zinfo, zip64)
 
-            path = os.fspath(path)
+            yield zinfo, stream
 
-        for zipinfo in members:
+            self._skip_member(stream)
 
-            self._extract_member(zipinfo, path, pwd)
+    def _read_local_header(self):
 
-    @classmethod
-    def _sanitize_windows_name(cls, arcname, pathsep):
-        
-        table = cls._windows_illegal_name_trans_table
+        reader = self._reader
+        header_offset = reader.tell()
+        fheader = reader.read_exact(sizeFileHeader)
 
-        if not table:
+        if not fheader or fheader[:4] in (stringCentralDir, stringEndArchive, stringEndArchive64):
 
-            illegal = ':<>|"?*'
-            table = str.maketrans(illegal, '_' * len(illegal))
-            cls._windows_illegal_name_trans_table = table
+            return None
 
-        arcname = arcname.translate(table)
-        
-        arcname = (x.rstrip('.') for x in arcname.split(pathsep))
-        
-        arcname = pathsep.join(x for x in arcname if x)
+        if len(fheader) != sizeFileHeader:
 
-        return arcname
+            raise BadZipFile("Truncated file header")
 
-    def _extract_member(self, member, targetpath, pwd):
+        fheader = struct.unpack(structFileHeader, fheader)
 
-        if not isinstance(member, ZipInfo):
+        if fheader[_FH_SIGNATURE] != stringFileHeader:
 
-            member = self.getinfo(member)
+            raise BadZipFile("Bad magic number for file header")
 
-        arcname = member.filename.replace('/', os.path.sep)
+        fname = reader.read_exact(fheader[_FH_FILENAME_LENGTH])
+        extra = reader.read_exact(fheader[_FH_EXTRA_FIELD_LENGTH])
 
-        if os.path.altsep:
+        if len(fname) != fheader[_FH_FILENAME_LENGTH] or len(extra) != fheader[_FH_EXTRA_FIELD_LENGTH]:
 
-            arcname = arcname.replace(os.path.altsep, os.path.sep)
-        
-        arcname = os.path.splitdrive(arcname)[1]
-        invalid_path_parts = ('', os.path.curdir, os.path.pardir)
-        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
-                                   if x not in invalid_path_parts)
-                                   
-        if os.path.sep == '\\':
-            
-            arcname = self._sanitize_windows_name(arcname, os.path.sep)
+            raise BadZipFile("Truncated file header")
 
-        targetpath = os.path.join(targetpath, arcname)
-        targetpath = os.path.normpath(targetpath)
+        flags = fheader[_FH_GENERAL_PURPOSE_FLAG_BITS]
 
-        upperdirs = os.path.dirname(targetpath)
+        if flags & _MASK_UTF_FILENAME:
 
-        if upperdirs and not os.path.exists(upperdirs):
+            fname = fname.decode('utf-8')
 
-            os.makedirs(upperdirs)
+        else:
 
-        if member.is_dir():
+            fname = fname.decode(self.metadata_encoding or 'cp437')
 
-            if not os.path.isdir(targetpath):
+        x = ZipInfo(fname)
+        x.extra = extra
+        x.header_offset = header_offset
+        (x.extract_version, x.reserved, x.flag_bits, x.compress_type, t, d,
+         x.CRC, x.compress_size, x.file_size) = fheader[1:10]
 
-                os.mkdir(targetpath)
+        if x.extract_version > MAX_EXTRACT_VERSION:
 
-            return targetpath
+            raise NotImplementedError("zip file version %.1f" % (x.extract_version / 10))
 
-        with self.open(member, pwd=pwd) as source, \
-             open(targetpath, "wb") as target:
-            shutil.copyfileobj(source, target)
+        if flags & _MASK_COMPRESSED_PATCH:
 
-        return targetpath
+            raise NotImplementedError("compressed patched data (flag bit 5)")
 
-    def _writecheck(self, zinfo):
-        
-        if zinfo.filename in self.NameToInfo:
+        if flags & _MASK_STRONG_ENCRYPTION:
 
-            import warnings
-            warnings.warn('Duplicate name: %r' % zinfo.filename, stacklevel=3)
+            raise NotImplementedError("strong encryption (flag bit 6)")
 
-        if self.mode not in ('w', 'x', 'a'):
+        x._raw_time = t
+        x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
+                        t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
+        x._decodeExtra()
+        zip64 = any(xid == 0x0001 for xid, ln in self._extra_fields(extra))
 
-            raise ValueError("write() requires mode 'w', 'x', or 'a'")
+        return x, zip64
 
-        if not self.fp:
+    @staticmethod
+    def _extra_fields(extra):
 
-            raise ValueError("Attempt to write ZIP archive that was already closed")
+        pos = 0
 
-        _check_compression(zinfo.compress_type)
+        while pos + 4 <= len(extra):
 
-        if not self._allowZip64:
+            xid, ln = _EXTRA_FIELD_STRUCT.unpack_from(extra, pos)
 
-            requires_zip64 = None
+            yield xid, ln
 
-            if len(self.filelist) >= ZIP_FILECOUNT_LIMIT:
+            pos += 4 + ln
 
-                requires_zip64 = "Files count"
+    def _open_member(self, zinfo, zip64):
 
-            elif zinfo.file_size > ZIP64_LIMIT:
+        pwd = None
 
-                requires_zip64 = "Filesize"
+        if zinfo.flag_bits & _MASK_ENCRYPTED:
 
-            elif zinfo.header_offset > ZIP64_LIMIT:
+            pwd = self.pwd
 
-                requires_zip64 = "Zipfile size"
+            if not pwd:
 
-            if requires_zip64:
+                raise RuntimeError("File %r is encrypted, password "
+                                   "required for extraction" % zinfo.filename)
 
-                raise LargeZipFile(requires_zip64 + " would require ZIP64 extensions")
+        if self._limits is not None:
 
-    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+            self._limits.archive_size = self._reader.tell() + zinfo.compress_size
 
-        if not self.fp:
+        if pwd:
 
-            raise ValueError("Attempt to write to ZIP archive that was already closed")
+            # The encryption header is read in one call; make sure all of
+            # it has arrived.
+            self._reader.unread(self._reader.read_exact(12))
 
-        if self._writing:
-            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+        if zinfo.flag_bits & _MASK_USE_DATA_DESCRIPTOR:
 
-        zinfo = ZipInfo.from_file(filename, arcname, strict_timestamps=self._strict_timestamps)
+            return _StreamedExtFile(self._reader, zinfo, pwd, self._limits, zip64)
 
-        if zinfo.is_dir():
+        return ZipExtFile(self._reader, 'r', zinfo, pwd, limits=self._limits)
 
-            zinfo.compress_size = 0
-            zinfo.CRC = 0
-            self.mkdir(zinfo)
+    def _skip_member(self, stream):
 
-        else:
+        if isinstance(stream, _StreamedExtFile):
 
-            if compress_type is not None:
+            # The end is only known once the data has been walked.
+            while not stream._eof:
 
-                zinfo.compress_type = compress_type
+                stream._read1(1 << 16)
 
-            else:
+        else:
 
-                zinfo.compress_type = self.compression
+            self._reader.skip(stream._compress_left)
 
-            if compresslevel is not None:
+        stream.close()
 
-                zinfo._compresslevel = compresslevel
+def _copy_range(src_fd, dst_fd, offset, count):
 
-            else:
+    copied = 0
+    use_copy_file_range = hasattr(os, 'copy_file_range')
 
-                zinfo._compresslevel = self.compresslevel
+    while copied < count:
 
-            with open(filename, "rb") as src, self.open(zinfo, 'w') as dest:
-                shutil.copyfileobj(src, dest, 1024*8)
+        try:
 
-    def mkdir(self, zinfo_or_directory_name, mode=511):
-        
-        if isinstance(zinfo_or_directory_name, ZipInfo):
+            if use_copy_file_range:
 
-            zinfo = zinfo_or_directory_name
+                n = os.copy_file_range(src_fd, dst_fd, count - copied, offset + copied)
 
-            if not zinfo.is_dir():
+            else:
 
-                raise ValueError("The given ZipInfo does not describe a directory")
+                n = os.sendfile(dst_fd, src_fd, offset + copied, count - copied)
 
-        elif isinstance(zinfo_or_directory_name, str):
+        except OSError:
 
-            directory_name = zinfo_or_directory_name
+            # Nothing written yet: try sendfile, then the regular copy.
+            if copied:
 
-            if not directory_name.endswith("/"):
+                raise
 
-                directory_name += "/"
+            if use_copy_file_range:
 
-            zinfo = ZipInfo(directory_name)
-            zinfo.compress_size = 0
-            zinfo.CRC = 0
-            zinfo.external_attr = ((0o40000 | mode) & 0xFFFF) << 16
-            zinfo.file_size = 0
-            zinfo.external_attr |= 0x10
+                use_copy_file_range = False
+                continue
 
-        else:
+            return False
 
-            raise TypeError("Expected type str or ZipInfo")
+        if not n:
 
-        with self._lock:
+            raise EOFError
 
-            if self._seekable:
+        copied += n
 
-                self.fp.seek(self.start_dir)
+    return True
 
-            zinfo.header_offset = self.fp.tell()
+_SPARSE_CHUNK = 1 << 20
+_SPARSE_BLOCK = 1 << 16
 
-            if zinfo.compress_type == ZIP_LZMA:
-            
-                zinfo.flag_bits |= _MASK_COMPRESS_OPTION_1
+def _copy_sparse(source, target):
 
-            self._writecheck(zinfo)
-            self._didModify = True
+    # All-zero blocks are seeked over, leaving holes; the final truncate
+    # sets the size when the file ends in one.
+    buf = bytearray(_SPARSE_CHUNK)
+    zero = bytes(_SPARSE_BLOCK)
 
-            self.filelist.append(zinfo)
-            self.NameToInfo[zinfo.filename] = zinfo
-            self.fp.write(zinfo.FileHeader(False))
-            self.start_dir = self.fp.tell()
+    with memoryview(buf) as view:
 
-    def __del__(self):
-        
-        self.close()
+        while True:
 
-    def close(self):
+            n = source.readinto(view)
 
-        if self.fp is None:
+            if not n:
 
-            return
+                break
 
-        if self._writing:
+            start = 0
 
-            raise ValueError("Can't close the ZIP file while there is "
-                             "an open writing handle on it. "
-                             "Close the writing handle before closing the zip.")
+            for pos in range(0, n, _SPARSE_BLOCK):
 
-        try:
+                end = min(pos + _SPARSE_BLOCK, n)
 
-            if self.mode in ('w', 'x', 'a') and self._didModify: # write ending records
+                if buf.startswith(zero if end - pos == _SPARSE_BLOCK else bytes(end - pos), pos):
 
-                with self._lock:
+                    if start < pos:
 
-                    if self._seekable:
+                        target.write(view[start:pos])
 
-                        self.fp.seek(self.start_dir)
+                    target.seek(end - pos, 1)
+                    start = end
 
-                    self._write_end_record()
+            if start < n:
 
-        finally:
+                target.write(view[start:n])
 
-            fp = self.fp
-            self.fp = None
-            self._fpclose(fp)
+    target.truncate()
 
-    def _write_end_record(self):
+_FICLONE = 0x40049409
 
-        for zinfo in self.filelist:
+def _clone_file(src, dst):
 
-            dt = zinfo.date_time
-            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
-            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
-            extra = []
+    # Try a reflink first, the copy then shares blocks with the source.
+    if fcntl is not None and sys.platform.startswith('linux'):
 
-            if zinfo.file_size > ZIP64_LIMIT \
-               or zinfo.compress_size > ZIP64_LIMIT:
-                extra.append(zinfo.file_size)
-                extra.append(zinfo.compress_size)
-                file_size = 0xffffffff
-                compress_size = 0xffffffff
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
 
-            else:
+            try:
 
-                file_size = zinfo.file_size
-                compress_size = zinfo.compress_size
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
 
-            if zinfo.header_offset > ZIP64_LIMIT:
+                return
 
-                extra.append(zinfo.header_offset)
-                header_offset = 0xffffffff
+            except OSError:
 
-            else:
+                pass
 
-                header_offset = zinfo.header_offset
+    shutil.copyfile(src, dst)
 
-            extra_data = zinfo.extra
-            min_version = 0
+_SPOOL_SIZE = 1 << 22
 
-            if extra:
-                
-                extra_data = _strip_extra(extra_data, (1,))
-                extra_data = struct.pack(
-                    '<HH' + 'Q'*len(extra),
-                    1, 8*len(extra), *extra) + extra_data
+def _compress_file(filename, compress_type, compresslevel):
 
-                min_version = ZIP64_VERSION
+    compressor = _get_compressor(compress_type, compresslevel)
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+    crc = file_size = 0
 
-            if zinfo.compress_type == ZIP_BZIP2:
+    try:
 
-                min_version = max(BZIP2_VERSION, min_version)
+        with open(filename, 'rb') as src:
 
-            elif zinfo.compress_type == ZIP_LZMA:
+            while True:
 
-                min_version = max(LZMA_VERSION, min_version)
+                data = src.read(1 << 20)
 
-            extract_version = max(min_version, zinfo.extract_version)
-            create_version = max(min_version, zinfo.create_version)
-            filename, flag_bits = zinfo._encodeFilenameFlags()
-            centdir = struct.pack(structCentralDir,
-                                  stringCentralDir, create_version,
-                                  zinfo.create_system, extract_version, zinfo.reserved,
-                                  flag_bits, zinfo.compress_type, dostime, dosdate,
-                                  zinfo.CRC, compress_size, file_size,
-                                  len(filename), len(extra_data), len(zinfo.comment),
-                                  0, zinfo.internal_attr, zinfo.external_attr,
-                                  header_offset)
-            self.fp.write(centdir)
-            self.fp.write(filename)
-            self.fp.write(extra_data)
-            self.fp.write(zinfo.comment)
+                if not data:
 
-        pos2 = self.fp.tell()
-        
-        centDirCount = len(self.filelist)
-        centDirSize = pos2 - self.start_dir
-        centDirOffset = self.start_dir
-        requires_zip64 = None
+                    break
 
-        if centDirCount > ZIP_FILECOUNT_LIMIT:
+                crc = crc32(data, crc)
+                file_size += len(data)
 
-            requires_zip64 = "Files count"
+                if compressor:
 
-        elif centDirOffset > ZIP64_LIMIT:
+                    data = compressor.compress(data)
 
-            requires_zip64 = "Central directory offset"
+                spool.write(data)
 
-        elif centDirSize > ZIP64_LIMIT:
+        if compressor:
 
-            requires_zip64 = "Central directory size"
+            spool.write(compressor.flush())
 
-        if requires_zip64:
-            
-            if not self._allowZip64:
+        compress_size = spool.tell()
+        spool.seek(0)
 
-                raise LargeZipFile(requires_zip64 + " would require ZIP64 extensions")
-                
-            zip64endrec = struct.pack(
-                structEndArchive64, stringEndArchive64,
-                44, 45, 45, 0, 0, centDirCount, centDirCount,
-                centDirSize, centDirOffset)
-            self.fp.write(zip64endrec)
+    except:
 
-            zip64locrec = struct.pack(
-                structEndArchive64Locator,
-                stringEndArchive64Locator, 0, pos2, 1)
-            self.fp.write(zip64locrec)
-            centDirCount = min(centDirCount, 0xFFFF)
-            centDirSize = min(centDirSize, 0xFFFFFFFF)
-            centDirOffset = min(centDirOffset, 0xFFFFFFFF)
+        spool.close()
 
-        endrec = struct.pack(structEndArchive, stringEndArchive,
-                             0, 0, centDirCount, centDirCount,
-                             centDirSize, centDirOffset, len(self._comment))
-        self.fp.write(endrec)
-        self.fp.write(self._comment)
+        raise
 
-        if self.mode == "a":
+    return crc, file_size, compress_size, spool
 
-            self.fp.truncate()
+def _extract_members_worker(filename, members, path, pwd, options, keyring):
 
-        self.fp.flush()
+    with ZipFile(filename, **options) as zf:
 
-    def _fpclose(self, fp):
-        
-        assert self._fileRefCnt > 0
-        self._fileRefCnt -= 1
+        if keyring:
 
-        if not self._fileRefCnt and not self._filePassed:
+            zf.setkeyring(keyring)
 
-            fp.close()
+        return zf._extract_members(members, path, pwd)
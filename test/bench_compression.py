@@ -0,0 +1,95 @@
+"""Compression ratio and speed of deflate, bzip2 and LZMA.
+
+    python bench_compression.py [FILE ...]
+
+Each file is stored as one member with every method and read back in
+1 MiB chunks.  Without arguments a text-like, an all-zero and a random
+sample are generated.
+"""
+
+import io
+import itertools
+import os
+import random
+import sys
+import time
+
+import libzip
+
+METHODS = (
+    ('deflate-6', libzip.ZIP_DEFLATED, None),
+    ('bzip2-9', libzip.ZIP_BZIP2, None),
+    ('lzma-1', libzip.ZIP_LZMA, 1),
+    ('lzma-6', libzip.ZIP_LZMA, None),
+    ('lzma-9', libzip.ZIP_LZMA, 9),
+)
+
+def samples():
+
+    # Words drawn with Zipf-like frequencies stand in for logs and prose.
+    rng = random.Random(0)
+    words = [bytes(rng.choices(b'abcdefghijklmnopqrstuvwxyz', k=rng.randint(2, 10)))
+             for _ in range(5000)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(words))))
+    lines = (b' '.join(rng.choices(words, cum_weights=cum_weights, k=12)) for _ in range(1 << 16))
+
+    return [('text', b'\n'.join(lines)),
+            ('zeros', bytes(16 << 20)),
+            ('random', os.urandom(8 << 20))]
+
+def bench(data, compress_type, compresslevel):
+
+    buf = io.BytesIO()
+    start = time.perf_counter()
+
+    with libzip.ZipFile(buf, 'w', compress_type, compresslevel=compresslevel) as zf:
+
+        zf.writestr('data', data)
+
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+
+    with libzip.ZipFile(buf) as zf:
+
+        compress_size = zf.getinfo('data').compress_size
+
+        with zf.open('data') as f:
+
+            while f.read(1 << 20):
+
+                pass
+
+    decompress_time = time.perf_counter() - start
+
+    return compress_size, compress_time, decompress_time
+
+def main(argv):
+
+    if argv:
+
+        datasets = []
+
+        for path in argv:
+
+            with open(path, 'rb') as f:
+
+                datasets.append((os.path.basename(path), f.read()))
+
+    else:
+
+        datasets = samples()
+
+    for name, data in datasets:
+
+        print('%s (%.1f MB)' % (name, len(data) / 1e6))
+
+        for label, compress_type, compresslevel in METHODS:
+
+            size, compress_time, decompress_time = bench(data, compress_type, compresslevel)
+            print('  %-10s ratio %8.2f  compress %8.1f MB/s  decompress %8.1f MB/s' %
+                  (label, len(data) / max(size, 1), len(data) / compress_time / 1e6,
+                   len(data) / decompress_time / 1e6))
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])
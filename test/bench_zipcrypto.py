@@ -0,0 +1,164 @@
+"""Throughput of ZipCrypto decryption.
+
+    python bench_zipcrypto.py [ARCHIVE PASSWORD]
+
+Without arguments a password-protected archive of random data is built
+in a temporary directory.  The table-driven _ZipDecrypter is timed
+against the closure it replaced, then ZipFile.read and extractall are
+timed on the archive.
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+import libzip
+
+def reference_decrypter(pwd):
+
+    # The closure-based decrypter libzip used before the table-driven one.
+    key0 = 305419896
+    key1 = 591751049
+    key2 = 878082192
+
+    crctable = list(map(libzip._gen_crc, range(256)))
+
+    def crc32(ch, crc):
+
+        return (crc >> 8) ^ crctable[(crc ^ ch) & 0xFF]
+
+    def update_keys(c):
+
+        nonlocal key0, key1, key2
+        key0 = crc32(c, key0)
+        key1 = (key1 + (key0 & 0xFF)) & 0xFFFFFFFF
+        key1 = (key1 * 134775813 + 1) & 0xFFFFFFFF
+        key2 = crc32(key1 >> 24, key2)
+
+    for p in pwd:
+        update_keys(p)
+
+    def decrypter(data):
+
+        result = bytearray()
+        append = result.append
+
+        for c in data:
+
+            k = key2 | 2
+            c ^= ((k * (k^1)) >> 8) & 0xFF
+            update_keys(c)
+            append(c)
+
+        return bytes(result)
+
+    return decrypter
+
+def encrypt(pwd, data):
+
+    # Encryption runs the same key schedule over the plaintext.
+    crctable = list(map(libzip._gen_crc, range(256)))
+    key0, key1, key2 = 305419896, 591751049, 878082192
+    result = bytearray()
+
+    for i, c in enumerate(pwd + data):
+
+        if i >= len(pwd):
+
+            k = key2 | 2
+            result.append(c ^ (((k * (k ^ 1)) >> 8) & 0xFF))
+
+        key0 = (key0 >> 8) ^ crctable[(key0 ^ c) & 0xFF]
+        key1 = ((key1 + (key0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        key2 = (key2 >> 8) ^ crctable[(key2 ^ (key1 >> 24)) & 0xFF]
+
+    return bytes(result)
+
+def make_archive(path, pwd, members, size):
+
+    local = []
+    central = []
+    offset = 0
+
+    for i in range(members):
+
+        name = ('member%d' % i).encode()
+        data = os.urandom(size)
+        crc = zlib.crc32(data)
+        data = encrypt(pwd, os.urandom(11) + bytes([crc >> 24]) + data)
+        header = struct.pack(libzip.structFileHeader, libzip.stringFileHeader, 20, 0, 1, 0,
+                             0, 0x21, crc, len(data), size, len(name), 0)
+        local.append(header + name + data)
+        central.append(struct.pack(libzip.structCentralDir, libzip.stringCentralDir, 20, 3, 20, 0,
+                                   1, 0, 0, 0x21, crc, len(data), size, len(name), 0, 0, 0, 0,
+                                   0, offset) + name)
+        offset += len(header) + len(name) + len(data)
+
+    central = b''.join(central)
+    end = struct.pack(libzip.structEndArchive, libzip.stringEndArchive, 0, 0, members, members,
+                      len(central), offset, 0)
+
+    with open(path, 'wb') as f:
+
+        f.writelines(local)
+        f.write(central)
+        f.write(end)
+
+def timed(func, nbytes, repeat=5):
+
+    best = min(_elapsed(func) for _ in range(repeat))
+
+    return nbytes / best / 1e6
+
+def _elapsed(func):
+
+    start = time.perf_counter()
+    func()
+
+    return time.perf_counter() - start
+
+def main(argv):
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        if len(argv) == 2:
+
+            path, pwd = argv[0], os.fsencode(argv[1])
+
+        else:
+
+            path, pwd = os.path.join(tmp, 'bench.zip'), b'benchmark'
+            make_archive(path, pwd, 4, 1 << 20)
+
+        with libzip.ZipFile(path) as zf:
+
+            infos = [info for info in zf.infolist() if info.flag_bits & 0x1]
+            total = sum(info.file_size for info in infos)
+            data = os.urandom(1 << 20)
+
+            new = libzip._ZipDecrypter(pwd)(data)
+            assert reference_decrypter(pwd)(data) == new
+
+            print('decrypt, reference closure  %8.2f MB/s' %
+                  timed(lambda: reference_decrypter(pwd)(data), len(data)))
+            print('decrypt, _ZipDecrypter      %8.2f MB/s' %
+                  timed(lambda: libzip._ZipDecrypter(pwd)(data), len(data)))
+            print('ZipFile.read                %8.2f MB/s' %
+                  timed(lambda: [zf.read(info, pwd) for info in infos], total, 1))
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+
+            def extract():
+
+                with libzip.ZipFile(path) as zf:
+
+                    zf.extractall(os.path.join(tmp, 'out'), infos, pwd, workers=workers)
+
+            print('extractall, %2d worker(s)    %8.2f MB/s' % (workers, timed(extract, total, 1)))
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])